@@ -2,20 +2,34 @@
 Base agent classes and utilities for CrewAI integration.
 """
 
-from crewai import Agent
-from typing import List, Optional
+from typing import TYPE_CHECKING, List, Optional
+import functools
 import logging
 
+if TYPE_CHECKING:
+    from crewai import Agent
+
 logger = logging.getLogger(__name__)
 
 
-def create_analyst_agent(llm=None, tools: Optional[List] = None) -> Agent:
+@functools.lru_cache(maxsize=1)
+def _agent_cls():
+    """
+    Import crewai on first use. Importing code_chatbot.agents.agent_workflow or
+    .tools runs this package's __init__, and the chat agent shouldn't pay for
+    loading CrewAI's stack.
+    """
+    from crewai import Agent
+    return Agent
+
+
+def create_analyst_agent(llm=None, tools: Optional[List] = None) -> "Agent":
     """
     Create a Code Analyst agent.
     
     Specializes in understanding codebase architecture and identifying patterns.
     """
-    return Agent(
+    return _agent_cls()(
         role="Senior Code Analyst",
         goal="Understand codebase architecture, identify patterns, and analyze code quality",
         backstory="""You are an expert software architect with 15 years of experience.
@@ -29,13 +43,13 @@ def create_analyst_agent(llm=None, tools: Optional[List] = None) -> Agent:
     )
 
 
-def create_refactor_agent(llm=None, tools: Optional[List] = None) -> Agent:
+def create_refactor_agent(llm=None, tools: Optional[List] = None) -> "Agent":
     """
     Create a Refactoring Specialist agent.
     
     Specializes in proposing and executing safe code refactorings.
     """
-    return Agent(
+    return _agent_cls()(
         role="Refactoring Specialist",
         goal="Improve code quality through safe, well-reasoned refactorings",
         backstory="""You are a master of code refactoring with deep knowledge of design patterns.
@@ -49,13 +63,13 @@ def create_refactor_agent(llm=None, tools: Optional[List] = None) -> Agent:
     )
 
 
-def create_reviewer_agent(llm=None, tools: Optional[List] = None) -> Agent:
+def create_reviewer_agent(llm=None, tools: Optional[List] = None) -> "Agent":
     """
     Create a Code Review Expert agent.
     
     Specializes in reviewing code changes and catching potential issues.
     """
-    return Agent(
+    return _agent_cls()(
         role="Code Review Expert",
         goal="Ensure code quality, catch bugs, and identify security issues",
         backstory="""You are a veteran code reviewer who has reviewed over 10,000 pull requests.
@@ -69,13 +83,13 @@ def create_reviewer_agent(llm=None, tools: Optional[List] = None) -> Agent:
     )
 
 
-def create_documentation_agent(llm=None, tools: Optional[List] = None) -> Agent:
+def create_documentation_agent(llm=None, tools: Optional[List] = None) -> "Agent":
     """
     Create a Documentation Specialist agent.
     
     Specializes in creating clear, comprehensive documentation.
     """
-    return Agent(
+    return _agent_cls()(
         role="Documentation Specialist",
         goal="Create clear, comprehensive, and helpful documentation",
         backstory="""You are a technical writer with deep programming knowledge.
@@ -1,6 +1,7 @@
 
 from typing import TypedDict, Annotated, Sequence
 import operator
+import os
 from langchain_core.messages import BaseMessage
 from langchain_core.tools import tool
 from langgraph.graph import StateGraph, END
@@ -33,15 +34,16 @@ def create_agent_graph(llm, retriever, repo_name: str = "Codebase", repo_dir: st
         You can call this multiple times with different queries to gather comprehensive information.
         """
         docs = retriever.invoke(query)
-        result = ""
+        parts = []
+        basename = os.path.basename
         # Increased to 5 results * 2000 chars = ~10000 chars (~2500 tokens) - much better context
         for i, doc in enumerate(docs[:5]):
             fp = doc.metadata.get('file_path', 'unknown')
             # Get relative path for cleaner display
-            import os
-            display_path = os.path.basename(fp) if fp != 'unknown' else 'unknown'
+            display_path = basename(fp) if fp != 'unknown' else 'unknown'
             content = doc.page_content[:2000]  # Increased from 1000 to 2000
-            result += f"--- Result {i+1}: {display_path} ---\n{content}\n\n"
+            parts.append(f"--- Result {i+1}: {display_path} ---\n{content}\n\n")
+        result = "".join(parts)
         
         if not result:
             return "No relevant code found. Try a different search query or use list_files to explore the codebase structure."
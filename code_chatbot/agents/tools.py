@@ -1,5 +1,7 @@
 import os
 import glob
+import mmap
+from pathlib import Path
 from typing import List, Optional
 from langchain_core.tools import tool
 from pydantic import BaseModel, Field
@@ -11,12 +13,34 @@ class ListFilesInput(BaseModel):
 class ReadFileInput(BaseModel):
     file_path: str = Field(description="Path to the file to read.")
 
+
+# Below this size a plain read is cheaper than setting up a mapping
+MMAP_MIN_SIZE = 4096
+
+# Groq TPM limit is ~12k tokens. 12000 chars is roughly 3k tokens.
+MAX_READ_BYTES = 12000
+
+
+def _read_bytes(path: str, limit: Optional[int] = None) -> bytes:
+    """Read up to `limit` bytes of a file, memory-mapping it when it is large enough."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < MMAP_MIN_SIZE:
+            return f.read(-1 if limit is None else limit)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return mm[:limit]
+
+
+def _inside(root: Path, path: str) -> bool:
+    """True if path resolves to root or somewhere below it (root must already be resolved)."""
+    return Path(path).resolve().is_relative_to(root)
+
 # Define Tools Factory
 def get_filesystem_tools(root_dir: str = "."):
     """Returns a list of tools bound to the specified root directory."""
     
     # Ensure root_dir is absolute
     root_dir = os.path.abspath(root_dir)
+    root_path = Path(root_dir).resolve()
 
     @tool("list_files", args_schema=ListFilesInput)
     def list_files(path: str = ".") -> str:
@@ -29,22 +53,19 @@ def get_filesystem_tools(root_dir: str = "."):
                 target_path = os.path.abspath(os.path.join(root_dir, path))
             
             # Security check: ensure we are inside the codebase
-            if not target_path.startswith(root_dir):
+            if not _inside(root_path, target_path):
                 return f"Error: Access denied. Path must be within the codebase: {root_dir}"
             
             if not os.path.exists(target_path):
                 return f"Error: Path does not exist: {path}"
 
-            files = []
-            for item in os.listdir(target_path):
-                if item.startswith(".") and item != ".gitignore": continue
-                
-                full_item_path = os.path.join(target_path, item)
-                
-                if os.path.isdir(full_item_path):
-                    files.append(f"{item}/")
-                else:
-                    files.append(item)
+            # scandir gives the entry type from the dirent, no extra stat per item
+            with os.scandir(target_path) as entries:
+                files = [
+                    f"{entry.name}/" if entry.is_dir(follow_symlinks=False) else entry.name
+                    for entry in entries
+                    if not (entry.name.startswith(".") and entry.name != ".gitignore")
+                ]
             
             # Sort for stability
             files.sort()
@@ -60,21 +81,24 @@ def get_filesystem_tools(root_dir: str = "."):
             full_path = os.path.abspath(os.path.join(root_dir, file_path))
             
             # Security check
-            if not full_path.startswith(root_dir):
+            if not _inside(root_path, full_path):
                 return "Error: Access denied. File must be within the codebase."
             
-            if not os.path.exists(full_path):
-                 return f"Error: File not found: {file_path}"
+            try:
+                size = os.stat(full_path).st_size
+            except FileNotFoundError:
+                return f"Error: File not found: {file_path}"
 
-            # Check file size to avoid overloading context
-            # Groq TPM limit is ~12k tokens. 12000 chars is roughly 3k tokens.
+            # Check file size to avoid overloading context.
             # We strictly prevent reading massive files to keep the agent alive.
-            if os.path.getsize(full_path) > 12000:
-                 return f"Error: File '{file_path}' is too large ({os.path.getsize(full_path)} bytes). Read specific lines or functions instead."
-                 
-            with open(full_path, "r", errors='ignore') as f:
-                content = f.read()
-                return content
+            if size > MAX_READ_BYTES:
+                return f"Error: File '{file_path}' is too large ({size} bytes). Read specific lines or functions instead."
+
+            # Bounded read, so a file that grew after the stat still can't exceed the budget
+            raw = _read_bytes(full_path, MAX_READ_BYTES + 1)
+            if len(raw) > MAX_READ_BYTES:
+                return f"Error: File '{file_path}' is too large (over {MAX_READ_BYTES} bytes). Read specific lines or functions instead."
+            return raw.decode("utf-8", "ignore")
         except Exception as e:
             return f"Error reading file: {e}"
 
@@ -113,15 +137,15 @@ def get_call_graph_tools(analyzer):
             if not callers:
                 return f"No callers found for '{function_name}'. It may be unused or called dynamically."
             
-            result = f"Functions that call '{function_name}':\n"
+            lines = [f"Functions that call '{function_name}':\n"]
             for caller in callers:
-                parts = caller.split("::")
-                if len(parts) == 2:
-                    result += f"  - {parts[1]} (in {parts[0]})\n"
+                module, func_name = analyzer.parsed_id(caller)
+                if module is not None:
+                    lines.append(f"  - {func_name} (in {module})\n")
                 else:
-                    result += f"  - {caller}\n"
+                    lines.append(f"  - {caller}\n")
             
-            return result
+            return "".join(lines)
         except Exception as e:
             return f"Error finding callers: {e}"
     
@@ -139,15 +163,15 @@ def get_call_graph_tools(analyzer):
             if not callees:
                 return f"No callees found for '{function_name}'. It may not call any other tracked functions."
             
-            result = f"Functions called by '{function_name}':\n"
+            lines = [f"Functions called by '{function_name}':\n"]
             for callee in callees:
-                parts = callee.split("::")
-                if len(parts) == 2:
-                    result += f"  - {parts[1]} (in {parts[0]})\n"
+                module, func_name = analyzer.parsed_id(callee)
+                if module is not None:
+                    lines.append(f"  - {func_name} (in {module})\n")
                 else:
-                    result += f"  - {callee}\n"
+                    lines.append(f"  - {callee}\n")
             
-            return result
+            return "".join(lines)
         except Exception as e:
             return f"Error finding callees: {e}"
     
@@ -165,18 +189,17 @@ def get_call_graph_tools(analyzer):
             if not chains:
                 return f"No call path found from '{start_function}' to '{end_function}'."
             
-            result = f"Call paths from '{start_function}' to '{end_function}':\n\n"
+            lines = [f"Call paths from '{start_function}' to '{end_function}':\n\n"]
             for i, chain in enumerate(chains[:5], 1):
-                result += f"Path {i}:\n"
+                lines.append(f"Path {i}:\n")
                 for j, node in enumerate(chain):
-                    parts = node.split("::")
-                    func_name = parts[1] if len(parts) == 2 else node
+                    _, func_name = analyzer.parsed_id(node)
                     indent = "  " * j
                     arrow = "-> " if j > 0 else ""
-                    result += f"{indent}{arrow}{func_name}\n"
-                result += "\n"
+                    lines.append(f"{indent}{arrow}{func_name}\n")
+                lines.append("\n")
             
-            return result
+            return "".join(lines)
         except Exception as e:
             return f"Error finding call chain: {e}"
     
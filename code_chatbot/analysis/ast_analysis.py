@@ -86,6 +86,9 @@ class EnhancedCodeAnalyzer:
         
         # Track unresolved calls for later resolution
         self.unresolved_calls: List[Tuple[str, str, int]] = []  # (caller_id, callee_name, line)
+
+        # node_id -> (file_path, name), filled lazily by parsed_id()
+        self._parsed_ids: Dict[str, Tuple[Optional[str], str]] = {}
         
         # Parsers
         self.parsers = {}
@@ -385,6 +388,15 @@ class EnhancedCodeAnalyzer:
         
         logger.info(f"Resolved {resolved_count} function calls in call graph")
     
+    def parsed_id(self, node_id: str) -> Tuple[Optional[str], str]:
+        """Split a "file_path::name" node id into (file_path, name); (None, node_id) if it has no file part."""
+        parsed = self._parsed_ids.get(node_id)
+        if parsed is None:
+            parts = node_id.split("::")
+            parsed = (parts[0], parts[1]) if len(parts) == 2 else (None, node_id)
+            self._parsed_ids[node_id] = parsed
+        return parsed
+    
     def get_callers(self, function_name: str) -> List[str]:
         """Find all functions that call the specified function."""
         callers = []
@@ -175,6 +175,12 @@ class RAGConfig:
     log_level: str = "INFO"
     """Logging level: DEBUG, INFO, WARNING, ERROR"""
     
+    enable_llm_cache: bool = False
+    """Answer repeated identical LLM calls from a local SQLite cache"""
+    
+    llm_cache_path: str = os.path.join(os.path.expanduser("~"), ".cache", "code_chatbot", "llm_cache.db")
+    """SQLite file backing the LLM response cache"""
+    
     @classmethod
     def from_env(cls) -> 'RAGConfig':
         """
@@ -194,6 +200,10 @@ class RAGConfig:
             llm_provider=os.getenv('LLM_PROVIDER', 'gemini'),
             llm_model=os.getenv('LLM_MODEL', 'gemini-2.0-flash-exp'),
             log_level=os.getenv('LOG_LEVEL', 'INFO'),
+            enable_llm_cache=os.getenv('ENABLE_LLM_CACHE', 'false').lower() == 'true',
+            llm_cache_path=os.getenv(
+                'LLM_CACHE_PATH', os.path.join(os.path.expanduser("~"), ".cache", "code_chatbot", "llm_cache.db")
+            ),
         )
     
     def validate(self) -> List[str]:
@@ -279,6 +289,7 @@ Providers:
   - Embeddings: {self.embedding_provider} ({self.embedding_model})
   - LLM: {self.llm_provider} ({self.llm_model})
   - Persist dir: {self.persist_directory}
+  - LLM cache: {self.enable_llm_cache}
 """.strip()
 
 
@@ -4,8 +4,10 @@ MCP Client for interacting with Refactor MCP Server.
 Provides async methods to call MCP tools from other parts of the application.
 """
 
+import itertools
 import logging
-from typing import List, Dict, Optional
+import re
+from typing import Iterable, Iterator, List, Dict, Optional, Union
 from code_chatbot.mcp.mcp_server import RefactorMCPServer, SearchResult, RefactorResult, RefactorSuggestion
 
 logger = logging.getLogger(__name__)
@@ -30,7 +32,7 @@ class MCPClient:
     
     def search_code(
         self,
-        pattern: str,
+        pattern: Union[str, re.Pattern],
         file_pattern: str = "**/*.py",
         context_lines: int = 2,
         is_regex: bool = True
@@ -39,7 +41,7 @@ class MCPClient:
         Search for patterns in codebase.
         
         Args:
-            pattern: Search pattern (regex or literal)
+            pattern: Search pattern (regex or literal), or an already compiled regex
             file_pattern: Glob pattern for files to search
             context_lines: Number of context lines before/after match
             is_regex: Whether pattern is regex
@@ -60,9 +62,32 @@ class MCPClient:
             logger.error(f"Code search failed: {e}")
             return []
     
+    def iter_search_code(
+        self,
+        pattern: Union[str, re.Pattern],
+        file_pattern: str = "**/*.py",
+        context_lines: int = 2,
+        is_regex: bool = True
+    ) -> Iterator[SearchResult]:
+        """
+        Stream search results as files are scanned.
+        
+        Takes the same arguments as search_code. Consumers that only need the
+        first N hits should use itertools.islice so the scan stops there.
+        """
+        try:
+            yield from self.server.iter_code_search(
+                pattern=pattern,
+                file_pattern=file_pattern,
+                context_lines=context_lines,
+                is_regex=is_regex
+            )
+        except Exception as e:
+            logger.error(f"Code search failed: {e}")
+    
     def refactor_code(
         self,
-        search_pattern: str,
+        search_pattern: Union[str, re.Pattern],
         replace_pattern: str,
         file_pattern: str = "**/*.py",
         dry_run: bool = True,
@@ -72,7 +97,7 @@ class MCPClient:
         Perform regex-based code refactoring.
         
         Args:
-            search_pattern: Pattern to search for
+            search_pattern: Pattern to search for, or an already compiled regex
             replace_pattern: Replacement string (supports capture groups)
             file_pattern: Glob pattern for files to process
             dry_run: If True, only show what would change
@@ -129,23 +154,31 @@ class MCPClient:
             logger.error(f"Suggestion generation failed: {e}")
             return []
     
-    def format_search_results(self, results: List[SearchResult], max_results: int = 10) -> str:
+    def format_search_results(self, results: Iterable[SearchResult], max_results: int = 10) -> str:
         """
         Format search results for display.
         
         Args:
-            results: List of search results
+            results: List of search results, or an iterator from iter_search_code
+                (only the first max_results + 1 items are consumed)
             max_results: Maximum number of results to format
             
         Returns:
             Formatted string
         """
-        if not results:
+        total = len(results) if isinstance(results, list) else None
+        shown = list(itertools.islice(results, max_results + 1))
+        if not shown:
             return "No results found."
+        has_more = len(shown) > max_results
+        del shown[max_results:]
         
-        output = [f"Found {len(results)} matches:\n"]
+        if total is not None:
+            output = [f"Found {total} matches:\n"]
+        else:
+            output = [f"Found {len(shown)}{'+' if has_more else ''} matches:\n"]
         
-        for i, result in enumerate(results[:max_results], 1):
+        for i, result in enumerate(shown, 1):
             output.append(f"\n{i}. {result.file_path}:{result.line_number}")
             output.append(f"   {result.line_content}")
             
@@ -154,8 +187,10 @@ class MCPClient:
                 for line in result.context_before[-2:]:
                     output.append(f"     {line}")
         
-        if len(results) > max_results:
-            output.append(f"\n... and {len(results) - max_results} more results")
+        if total is not None and has_more:
+            output.append(f"\n... and {total - max_results} more results")
+        elif has_more:
+            output.append("\n... and more results")
         
         return '\n'.join(output)
     
@@ -4,13 +4,23 @@ MCP (Model Context Protocol) Server for Code Refactoring.
 Provides tools for code search, refactoring, and analysis via MCP protocol.
 """
 
+import fnmatch
+import functools
 import logging
+import os
 import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
+from typing import Iterator, List, Dict, Optional, Tuple, Union
 from dataclasses import dataclass
 import ast
 
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
 logger = logging.getLogger(__name__)
 
 
@@ -49,6 +59,107 @@ class RefactorSuggestion:
     estimated_impact: str  # 'low', 'medium', 'high'
 
 
+def _compile_pattern(pattern: Union[str, re.Pattern], is_regex: bool) -> re.Pattern:
+    """Use a precompiled pattern as-is; compile strings (escaped unless is_regex)."""
+    if isinstance(pattern, re.Pattern):
+        return pattern
+    return _compile_string(pattern, is_regex)
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_string(pattern: str, is_regex: bool) -> re.Pattern:
+    # Repeated searches/refactors with the same string skip re's smaller shared cache
+    return re.compile(pattern if is_regex else re.escape(pattern))
+
+
+# Flags a compiled pattern can keep inside a merged regex, as a scoped inline group
+_SCOPED_FLAGS = {re.IGNORECASE: "i", re.MULTILINE: "m", re.DOTALL: "s", re.VERBOSE: "x"}
+# Leading global inline flags, e.g. "(?i)"; already reflected in Pattern.flags
+_GLOBAL_FLAGS_RE = re.compile(r"^(?:\(\?[aiLmsux]+\))+")
+# Opcodes that refer to a capturing group by its number
+_GROUP_REF_OPS = (sre_parse.GROUPREF, sre_parse.GROUPREF_EXISTS)
+
+
+def _has_group_reference(node) -> bool:
+    """True if a parsed pattern contains a backreference or a (?(group)...) conditional."""
+    if isinstance(node, sre_parse.SubPattern):
+        return any(op in _GROUP_REF_OPS or _has_group_reference(av) for op, av in node)
+    if isinstance(node, (list, tuple)):
+        return any(_has_group_reference(item) for item in node)
+    return False
+
+
+def _merge_patterns(compiled: List[re.Pattern]) -> re.Pattern:
+    """
+    OR compiled patterns into a single regex, keeping each one's i/m/s/x flags scoped to it.
+    Raises ValueError for patterns that can't be merged faithfully: other flags
+    (ASCII, LOCALE), a group name used by more than one pattern, or a group reference
+    (\\1, (?(1)...)) in a pattern that follows capturing groups, since group numbers
+    shift in the merged regex. The parsed form resolves (?P=name) to a number too, so
+    named references are rejected there as well.
+    """
+    parts = []
+    group_names = set()
+    group_count = 0
+    for p in compiled:
+        flags = p.flags & ~re.UNICODE
+        inline = "".join(letter for flag, letter in _SCOPED_FLAGS.items() if flags & flag)
+        for flag in _SCOPED_FLAGS:
+            flags &= ~flag
+        if flags:
+            raise ValueError(f"Pattern {p.pattern!r} uses flags that can't be merged: {re.RegexFlag(flags)!r}")
+        duplicates = group_names & p.groupindex.keys()
+        if duplicates:
+            raise ValueError(f"Group name(s) {sorted(duplicates)} are used by more than one pattern")
+        group_names.update(p.groupindex)
+        if group_count and p.groups and _has_group_reference(sre_parse.parse(p.pattern, p.flags)):
+            raise ValueError(f"Pattern {p.pattern!r} refers to its own groups, whose numbers merging would shift")
+        group_count += p.groups
+        body = _GLOBAL_FLAGS_RE.sub("", p.pattern)
+        # A trailing verbose-mode comment would otherwise swallow the closing paren
+        if "x" in inline:
+            body += "\n"
+        parts.append(f"(?{inline}:{body})")
+    return re.compile("|".join(parts))
+
+
+def _glob_segment(segment: str) -> str:
+    """Regex for one path segment of a glob; wildcards never cross '/'."""
+    out = []
+    i = 0
+    while i < len(segment):
+        c = segment[i]
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[" and segment.find("]", i + 1) != -1:
+            j = segment.find("]", i + 1)
+            body = segment[i + 1:j]
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            out.append(f"[{body}]")
+            i = j
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+@functools.lru_cache(maxsize=64)
+def _glob_regex(pattern: str) -> re.Pattern:
+    """Compile a pathlib-style glob ('**' spans directories) to a regex over '/'-joined relative paths."""
+    segments = pattern.strip("/").split("/")
+    parts = []
+    for i, segment in enumerate(segments):
+        last = i == len(segments) - 1
+        if segment == "**":
+            parts.append(".*" if last else "(?:[^/]+/)*")
+        else:
+            parts.append(_glob_segment(segment) + ("" if last else "/"))
+    return re.compile("".join(parts))
+
+
 class RefactorMCPServer:
     """
     MCP server providing code refactoring tools.
@@ -80,10 +191,14 @@ class RefactorMCPServer:
             '**/build/**',
             '**/*.egg-info/**'
         ]
+        # Directory names from '**/<name>/**' ignore patterns; the walk never descends into them
+        self._ignored_dir_globs = [
+            p[3:-3] for p in self.ignore_patterns if p.startswith('**/') and p.endswith('/**')
+        ]
     
     def code_search(
         self,
-        pattern: str,
+        pattern: Union[str, re.Pattern],
         file_pattern: str = "**/*.py",
         context_lines: int = 2,
         is_regex: bool = True
@@ -92,7 +207,7 @@ class RefactorMCPServer:
         Search for patterns in codebase.
         
         Args:
-            pattern: Search pattern (regex or literal)
+            pattern: Search pattern (regex or literal), or an already compiled regex
             file_pattern: Glob pattern for files to search
             context_lines: Number of context lines before/after match
             is_regex: Whether pattern is regex
@@ -100,70 +215,138 @@ class RefactorMCPServer:
         Returns:
             List of search results
         """
-        results = []
+        results = list(self.iter_code_search(pattern, file_pattern, context_lines, is_regex))
+        logger.info(f"Found {len(results)} matches for pattern '{getattr(pattern, 'pattern', pattern)}'")
+        return results
+    
+    def iter_code_search(
+        self,
+        pattern: Union[str, re.Pattern],
+        file_pattern: str = "**/*.py",
+        context_lines: int = 2,
+        is_regex: bool = True
+    ) -> Iterator[SearchResult]:
+        """
+        Like code_search, but yields matches while the files are walked.
         
+        Stopping early (e.g. with itertools.islice) stops the walk, so the
+        first hits don't wait for the whole codebase to be scanned.
+        """
         # Compile regex pattern
         try:
-            if is_regex:
-                regex = re.compile(pattern)
-            else:
-                regex = re.compile(re.escape(pattern))
+            regex = _compile_pattern(pattern, is_regex)
         except re.error as e:
             logger.error(f"Invalid regex pattern: {e}")
-            return results
+            return
+        
+        for file_path in self._iter_files(file_pattern):
+            yield from self._search_file(file_path, regex, context_lines)
+    
+    def code_search_batch(
+        self,
+        patterns: List[Union[str, re.Pattern]],
+        file_pattern: str = "**/*.py",
+        context_lines: int = 2,
+        is_regex: bool = True,
+        max_workers: int = 16
+    ) -> List[SearchResult]:
+        """
+        Search for any of several patterns in one pass over the codebase.
+        
+        The files are globbed once and the patterns are OR'd into a single regex,
+        so each file is read and scanned once however many patterns there are.
+        Files are read on a thread pool since the work is disk-bound.
+        
+        Args:
+            patterns: Search patterns (regex or literal, or compiled regexes).
+                Numbered backreferences inside a pattern do not survive the merge.
+            file_pattern: Glob pattern for files to search
+            context_lines: Number of context lines before/after match
+            is_regex: Whether string patterns are regex
+            max_workers: Maximum number of files read concurrently
+            
+        Returns:
+            List of search results, in file order
+            
+        Raises:
+            ValueError: If a compiled pattern has ASCII/LOCALE flags, or two
+                patterns define the same group name (see _merge_patterns).
+        """
+        try:
+            compiled = [_compile_pattern(p, is_regex) for p in patterns]
+            regex = _merge_patterns(compiled)
+        except re.error as e:
+            logger.error(f"Invalid regex pattern: {e}")
+            return []
         
-        # Find matching files
         files = self._find_files(file_pattern)
+        results = []
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for file_results in pool.map(lambda fp: self._search_file(fp, regex, context_lines), files):
+                results.extend(file_results)
         
-        for file_path in files:
-            try:
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    lines = f.readlines()
-                
-                # Search each line
-                for line_num, line in enumerate(lines, start=1):
+        logger.info(f"Found {len(results)} matches for {len(compiled)} patterns")
+        return results
+    
+    def _search_file(self, file_path: Path, regex: re.Pattern, context_lines: int) -> List[SearchResult]:
+        """
+        Matching lines of one file, with context.
+        
+        The file is streamed line by line: the previous context_lines lines are kept
+        in a deque, and recent hits collect their context_after as later lines arrive.
+        """
+        results = []
+        before = deque(maxlen=context_lines)
+        waiting = []  # hits still short of context_after lines
+        try:
+            relative_path = str(file_path.relative_to(self.workspace_root))
+            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                for line_num, line in enumerate(f, start=1):
+                    stripped = line.rstrip()
+                    if waiting:
+                        for result in waiting:
+                            result.context_after.append(stripped)
+                        waiting = [r for r in waiting if len(r.context_after) < context_lines]
+                    
                     match = regex.search(line)
                     if match:
-                        # Get context
-                        start_idx = max(0, line_num - context_lines - 1)
-                        end_idx = min(len(lines), line_num + context_lines)
-                        
-                        context_before = [l.rstrip() for l in lines[start_idx:line_num-1]]
-                        context_after = [l.rstrip() for l in lines[line_num:end_idx]]
-                        
-                        results.append(SearchResult(
-                            file_path=str(file_path.relative_to(self.workspace_root)),
+                        result = SearchResult(
+                            file_path=relative_path,
                             line_number=line_num,
-                            line_content=line.rstrip(),
-                            context_before=context_before,
-                            context_after=context_after,
+                            line_content=stripped,
+                            context_before=list(before),
+                            context_after=[],
                             match_start=match.start(),
                             match_end=match.end()
-                        ))
-            
-            except Exception as e:
-                logger.error(f"Error searching {file_path}: {e}")
+                        )
+                        results.append(result)
+                        if context_lines > 0:
+                            waiting.append(result)
+                    before.append(stripped)
         
-        logger.info(f"Found {len(results)} matches for pattern '{pattern}'")
+        except Exception as e:
+            logger.error(f"Error searching {file_path}: {e}")
         return results
     
     def code_refactor(
         self,
-        search_pattern: str,
+        search_pattern: Union[str, re.Pattern],
         replace_pattern: str,
         file_pattern: str = "**/*.py",
         dry_run: bool = True,
-        is_regex: bool = True
+        is_regex: bool = True,
+        max_workers: int = 16
     ) -> RefactorResult:
         """
         Perform regex-based code refactoring.
         
         Args:
-            search_pattern: Pattern to search for
+            search_pattern: Pattern to search for, or an already compiled regex
             replace_pattern: Replacement string (supports capture groups)
             file_pattern: Glob pattern for files to process
             dry_run: If True, only show what would change
             is_regex: Whether pattern is regex
+            max_workers: Threads processing files concurrently (the work is mostly file I/O)
             
         Returns:
             RefactorResult with changes made or to be made
@@ -174,10 +357,7 @@ class RefactorMCPServer:
         
         try:
             # Compile regex
-            if is_regex:
-                regex = re.compile(search_pattern)
-            else:
-                regex = re.compile(re.escape(search_pattern))
+            regex = _compile_pattern(search_pattern, is_regex)
         except re.error as e:
             return RefactorResult(
                 files_changed=0,
@@ -191,34 +371,13 @@ class RefactorMCPServer:
         # Find matching files
         files = self._find_files(file_pattern)
         
-        for file_path in files:
-            try:
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    original_content = f.read()
-                
-                # Perform replacement
-                new_content, num_replacements = regex.subn(replace_pattern, original_content)
-                
-                if num_replacements > 0:
+        # Files are independent; map keeps the changes in file order
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for change in pool.map(lambda fp: self._refactor_file(fp, regex, replace_pattern, dry_run), files):
+                if change is not None:
                     files_changed += 1
-                    total_replacements += num_replacements
-                    
-                    # Record change
-                    change = {
-                        'file_path': str(file_path.relative_to(self.workspace_root)),
-                        'replacements': num_replacements,
-                        'preview': self._generate_diff_preview(original_content, new_content)
-                    }
+                    total_replacements += change['replacements']
                     changes.append(change)
-                    
-                    # Apply change if not dry run
-                    if not dry_run:
-                        with open(file_path, 'w', encoding='utf-8') as f:
-                            f.write(new_content)
-                        logger.info(f"Applied {num_replacements} replacements to {file_path}")
-            
-            except Exception as e:
-                logger.error(f"Error processing {file_path}: {e}")
         
         result = RefactorResult(
             files_changed=files_changed,
@@ -233,6 +392,37 @@ class RefactorMCPServer:
         
         return result
     
+    def _refactor_file(
+        self, file_path: Path, regex: re.Pattern, replace_pattern: str, dry_run: bool
+    ) -> Optional[Dict]:
+        """Apply the replacement to one file; the change record, or None if nothing matched."""
+        try:
+            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                original_content = f.read()
+            
+            # Perform replacement
+            new_content, num_replacements = regex.subn(replace_pattern, original_content)
+            if num_replacements == 0:
+                return None
+            
+            # Record change
+            change = {
+                'file_path': str(file_path.relative_to(self.workspace_root)),
+                'replacements': num_replacements,
+                'preview': self._generate_diff_preview(original_content, new_content)
+            }
+            
+            # Apply change if not dry run
+            if not dry_run:
+                with open(file_path, 'w', encoding='utf-8') as f:
+                    f.write(new_content)
+                logger.info(f"Applied {num_replacements} replacements to {file_path}")
+            return change
+        
+        except Exception as e:
+            logger.error(f"Error processing {file_path}: {e}")
+            return None
+    
     def suggest_refactorings(
         self,
         file_path: str,
@@ -302,13 +492,46 @@ class RefactorMCPServer:
     
     def _find_files(self, pattern: str) -> List[Path]:
         """Find files matching glob pattern, excluding ignored paths."""
-        files = []
+        return list(self._iter_files(pattern))
+    
+    def _iter_files(self, pattern: str) -> Iterator[Path]:
+        """
+        Stream files matching the glob from an os.scandir walk.
         
-        for file_path in self.workspace_root.glob(pattern):
-            if file_path.is_file() and not self._should_ignore(file_path):
-                files.append(file_path)
+        Entries are matched as plain relative-path strings, so a Path object is only
+        built for files that match. Ignored directories are pruned instead of walked,
+        and without '**' the walk stops at the pattern's depth.
         
-        return files
+        Yields the same files as Path.glob filtered by _should_ignore, except that
+        directories named by '**/<name>/**' ignore patterns are skipped at every depth.
+        Path.match only compares trailing segments, so the old filter let through
+        e.g. .git/config or node_modules/pkg/index.js at the top level.
+        A trailing '**' matches only directories in Path.glob, so it yields no files here either.
+        """
+        if pattern.strip("/").split("/")[-1] == "**":
+            return
+        matcher = _glob_regex(pattern)
+        max_depth = None if "**" in pattern else pattern.strip("/").count("/")
+        stack = [(str(self.workspace_root), "", 0)]
+        while stack:
+            dir_path, rel_dir, depth = stack.pop()
+            try:
+                entries = os.scandir(dir_path)
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    rel_path = rel_dir + entry.name
+                    if entry.is_dir(follow_symlinks=False):
+                        if max_depth is not None and depth >= max_depth:
+                            continue
+                        if any(fnmatch.fnmatchcase(entry.name, g) for g in self._ignored_dir_globs):
+                            continue
+                        stack.append((entry.path, rel_path + "/", depth + 1))
+                    elif matcher.fullmatch(rel_path) and entry.is_file():
+                        file_path = Path(entry.path)
+                        if not self._should_ignore(file_path):
+                            yield file_path
     
     def _should_ignore(self, file_path: Path) -> bool:
         """Check if file should be ignored."""
@@ -350,11 +573,13 @@ if __name__ == "__main__":
     # Create server
     server = RefactorMCPServer("/Users/asishkarthikeyagogineni/Desktop/Codebase_Agent")
     
+    # Output is collected and written once at the end
+    output = []
+    
     # Test code search
     results = server.code_search("def.*index", file_pattern="**/*.py")
-    print(f"\nFound {len(results)} matches")
-    for r in results[:3]:
-        print(f"  {r.file_path}:{r.line_number} - {r.line_content[:60]}")
+    output.append(f"\nFound {len(results)} matches")
+    output.extend(f"  {r.file_path}:{r.line_number} - {r.line_content[:60]}" for r in results[:3])
     
     # Test refactor (dry run)
     refactor_result = server.code_refactor(
@@ -363,4 +588,5 @@ if __name__ == "__main__":
         file_pattern="**/*.py",
         dry_run=True
     )
-    print(f"\nRefactor preview: {refactor_result.files_changed} files, {refactor_result.total_replacements} replacements")
+    output.append(f"\nRefactor preview: {refactor_result.files_changed} files, {refactor_result.total_replacements} replacements")
+    print("\n".join(output))
@@ -67,7 +67,7 @@ class GraphEnhancedRetriever(BaseRetriever):
         
         # Sort by priority (descending), keeping relative order for same priority
         ranked = sorted(docs, key=lambda d: get_priority(d), reverse=True)
-        logger.info(f"Reranked docs: top files are {[d.metadata.get('file_path', '?').split('/')[-1] for d in ranked[:3]]}")
+        logger.info(f"Reranked docs: top files are {[os.path.basename(d.metadata.get('file_path', '?')) for d in ranked[:3]]}")
         return ranked
 
     def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
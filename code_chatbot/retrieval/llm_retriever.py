@@ -1,6 +1,8 @@
+import functools
 import logging
 import os
-from typing import Any, Dict, List, Optional, Set
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
 from anytree import Node, RenderTree
 from langchain_core.callbacks import CallbackManagerForRetrieverRun
 from langchain_core.documents import Document
@@ -8,10 +10,70 @@ from langchain_core.retrievers import BaseRetriever
 from langchain_core.language_models import BaseChatModel
 from langchain_core.messages import SystemMessage, HumanMessage
 from pydantic import PrivateAttr
-import Levenshtein
+from rapidfuzz import process
+from rapidfuzz.distance import Levenshtein
 
 logger = logging.getLogger(__name__)
 
+# Maps anytree's box-drawing characters to spaces in one pass
+_RENDER_TR = str.maketrans({"└": " ", "├": " ", "│": " ", "─": " "})
+
+
+def _mtime(path: str) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+@functools.lru_cache(maxsize=8)
+def _render_repo_structure(fingerprint: Tuple[Tuple[str, Optional[float]], ...]) -> str:
+    """
+    Visual tree of the repository, cached in memory per (path, mtime) fingerprint
+    so retrievers rebuilt for an unchanged repo reuse the rendering.
+    """
+    root = Node("root")
+    nodes = {"": root}
+    
+    for file_path, _ in fingerprint:
+        parts = file_path.strip("/").split("/")
+        current_path = ""
+        parent = root
+        
+        for part in parts:
+            current_path = f"{current_path}/{part}" if current_path else part
+            if current_path not in nodes:
+                nodes[current_path] = Node(part, parent=parent)
+            parent = nodes[current_path]
+    
+    # Render tree, simplifying box-drawing characters for token efficiency
+    render = [
+        f"{pre}{node.name}".translate(_RENDER_TR)
+        for pre, _, node in RenderTree(root)
+        if node.name != "root"
+    ]
+    return "".join(line + "\n" for line in render)
+
+
+def _read_one(filename: str) -> Optional[Document]:
+    """Read a selected file into a Document (empty with an error flag if missing)."""
+    # The repo_files passed in are expected to be paths we can open directly.
+    try:
+        if os.path.exists(filename):
+            with open(filename, "r", errors='ignore') as f:
+                return Document(
+                    page_content=f.read(),
+                    metadata={"file_path": filename, "source": "llm_retriever"}
+                )
+        return Document(
+            page_content="",
+            metadata={"file_path": filename, "source": "llm_retriever", "error": "File not found"}
+        )
+    except Exception as e:
+        logger.warning(f"Failed to read file {filename}: {e}")
+        return None
+
+
 class LLMRetriever(BaseRetriever):
     """
     Retriever that uses an LLM to select relevant files from the project structure.
@@ -23,41 +85,55 @@ class LLMRetriever(BaseRetriever):
     top_k: int = 5
     repo_structure: str = ""
 
+    _files_set: frozenset = PrivateAttr(default_factory=frozenset)
+    _basename_index: Dict[str, List[str]] = PrivateAttr(default_factory=dict)
+    _system_message: Optional[SystemMessage] = PrivateAttr(default=None)
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
+        self._setup()
+
+    @classmethod
+    def create(cls, llm: BaseChatModel, repo_files: List[str], top_k: int = 5) -> "LLMRetriever":
+        """
+        Build a retriever without pydantic field validation.
+        The caller controls the inputs, and re-validating every path of a large
+        repo_files list is the dominant construction cost.
+        """
+        obj = cls.model_construct(llm=llm, repo_files=repo_files, top_k=top_k)
+        obj._setup()
+        return obj
+
+    def _setup(self):
+        """Derive lookup indexes, the repo structure and the system prompt from the fields."""
+        self._files_set = frozenset(self.repo_files)
+        for f in self.repo_files:
+            self._basename_index.setdefault(os.path.basename(f), []).append(f)
         # Use object.__setattr__ to avoid pydantic validation errors if frozen
         # But since we made it a field, we can just set it OR pass it in kwargs if calculated before.
         # Better: calculate it here and set it.
-        structure = self._build_repo_structure(self.repo_files)
-        self.repo_structure = structure
-        
+        self.repo_structure = self._build_repo_structure(self.repo_files)
+        self._system_message = SystemMessage(content=self._build_system_prompt())
+
+    def _build_system_prompt(self) -> str:
+        """Static instructions + repo structure; the user query goes in the human message."""
+        return f"""
+You are a senior software engineer helping to navigate a codebase.
+Your task is to identify the top {self.top_k} files in the repository that are most likely to contain the answer to the user's query.
+
+Here is the file structure of the repository:
+{self.repo_structure}
+
+Rules:
+1. Respond ONLY with a list of file paths, one per line.
+2. Do not include any explanation or conversational text.
+3. Select files that are relevant to the user's query.
+4. If the file paths in the structure are relative, return them as they appear in the structure.
+"""
+
     def _build_repo_structure(self, files: List[str]) -> str:
         """Builds a visual tree structure of the repository."""
-        # Build tree
-        root = Node("root")
-        nodes = {"": root}
-        
-        for file_path in files:
-            parts = file_path.strip("/").split("/")
-            current_path = ""
-            parent = root
-            
-            for part in parts:
-                current_path = f"{current_path}/{part}" if current_path else part
-                if current_path not in nodes:
-                    nodes[current_path] = Node(part, parent=parent)
-                parent = nodes[current_path]
-        
-        # Render tree
-        render = ""
-        for pre, _, node in RenderTree(root):
-            if node.name == "root": continue
-            # Simplify characters for token efficiency
-            line = f"{pre}{node.name}"
-            line = line.replace("└", " ").replace("├", " ").replace("│", " ").replace("─", " ")
-            render += line + "\n"
-            
-        return render
+        return _render_repo_structure(tuple((path, _mtime(path)) for path in files))
 
     def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
         """Retrieve relevant documents for a given query."""
@@ -66,36 +142,13 @@ class LLMRetriever(BaseRetriever):
             filenames = self._ask_llm_to_retrieve(query)
             logger.info(f"LLMRetriever: Selected {len(filenames)} files: {filenames}")
             
-            documents = []
-            for filename in filenames:
-                # We expect the caller to handle reading the actual content if needed, 
-                # or we return a Document with just metadata if we don't have access to the file system here.
-                # Ideally, we should have access to read the file. 
-                # Let's assume we can read if it is a local path (which it should be in this app).
-                
-                # Check if we can find the absolute path? 
-                # The repo_files passed in might be relative paths or absolute.
-                # We will assume they are paths we can open.
-                
-                try:
-                    # If repo_files are absolute, great. If relative, we might need a base_dir.
-                    # For now, let's assume the passed repo_files are valid paths to read.
-                    if os.path.exists(filename):
-                         with open(filename, "r", errors='ignore') as f:
-                            content = f.read()
-                            documents.append(Document(
-                                page_content=content,
-                                metadata={"file_path": filename, "source": "llm_retriever"}
-                            ))
-                    else:
-                        documents.append(Document(
-                            page_content="",
-                            metadata={"file_path": filename, "source": "llm_retriever", "error": "File not found"}
-                        ))
-                except Exception as e:
-                    logger.warning(f"Failed to read file {filename}: {e}")
-                    
-            return documents
+            if not filenames:
+                return []
+
+            # Reads are I/O bound (GIL released), so fetch the files concurrently
+            with ThreadPoolExecutor(max_workers=min(8, len(filenames))) as executor:
+                results = list(executor.map(_read_one, filenames))
+            return [doc for doc in results if doc is not None]
         except Exception as e:
             logger.error(f"LLMRetriever failed: {e}")
             return []
@@ -103,22 +156,10 @@ class LLMRetriever(BaseRetriever):
     def _ask_llm_to_retrieve(self, user_query: str) -> List[str]:
         """Feeds the file hierarchy and user query to the LLM."""
         
-        system_prompt = f"""
-You are a senior software engineer helping to navigate a codebase.
-Your task is to identify the top {self.top_k} files in the repository that are most likely to contain the answer to the user's query.
-
-Here is the file structure of the repository:
-{self.repo_structure}
-
-Rules:
-1. Respond ONLY with a list of file paths, one per line.
-2. Do not include any explanation or conversational text.
-3. Select files that are relevant to: "{user_query}"
-4. If the file paths in the structure are relative, return them as they appear in the structure.
-"""
+        # The system message is static per repo so providers can cache the prefix
         messages = [
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=f"User Query: {user_query}")
+            self._system_message,
+            HumanMessage(content=f"Top {self.top_k} files for: {user_query}")
         ]
         
         response = self.llm.invoke(messages)
@@ -136,31 +177,21 @@ Rules:
                 if match:
                     selected_files.append(match)
         
-        return list(set(selected_files))[:self.top_k]
+        # Dedupe while keeping the LLM's ranking order
+        return list(dict.fromkeys(selected_files))[:self.top_k]
 
     def _find_best_match(self, filename: str) -> Optional[str]:
         """Finds the closest matching filename from the repo."""
-        if filename in self.repo_files:
+        if filename in self._files_set:
             return filename
             
         # 1. Try exact match on basename
-        for f in self.repo_files:
-            if os.path.basename(f) == filename:
-                return f
-        
-        # 2. Fuzzy match
-        best_match = None
-        min_dist = float('inf')
+        same_name = self._basename_index.get(filename)
+        if same_name:
+            return same_name[0]
         
-        for f in self.repo_files:
-            # We compare with the full path or just the end?
-            # Let's compare with the full path since LLM sees the structure.
-            dist = Levenshtein.distance(filename, f)
-            if dist < min_dist:
-                min_dist = dist
-                best_match = f
-                
-        if min_dist < 20: # Arbitrary threshold
-            return best_match
-            
-        return None
+        # 2. Fuzzy match against the full path, since the LLM sees the structure
+        match = process.extractOne(
+            filename, self.repo_files, scorer=Levenshtein.distance, score_cutoff=19  # Arbitrary threshold
+        )
+        return match[0] if match else None
@@ -1,14 +1,25 @@
-from typing import List, Tuple, Any, Optional
+from typing import Iterator, List, Tuple, Any, Optional
+import concurrent.futures
+import functools
+import json
 import logging
+import threading
+import time
+import tiktoken
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder, PromptTemplate
+from langchain_core.globals import get_llm_cache
+from langchain_core.load import dumps
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
+from langchain_core.outputs import ChatGeneration
 from langchain_core.retrievers import BaseRetriever
 # Simplified implementation that works with current langchain version
 # We'll implement history-aware retrieval manually
-from code_chatbot.retrieval.reranker import Reranker
-from code_chatbot.retrieval.retriever_wrapper import build_enhanced_retriever
+from code_chatbot.core.config import get_config
+from code_chatbot.core.prompts import get_prompt_for_provider
+from code_chatbot.retrieval.reranker import Reranker, get_reranker
+from code_chatbot.retrieval.retriever_wrapper import AdaptiveEnsembleRetriever, build_enhanced_retriever
 import os
 
 # Configure logging
@@ -31,6 +42,186 @@ GEMINI_FALLBACK_MODELS = [
     "gemini-pro",
 ]
 
+# Total seconds of backoff across consecutive rate-limit switches (reset once a turn succeeds)
+GEMINI_SWITCH_WAIT_BUDGET = 8
+# Remembers the selected model so later startups skip listing models
+GEMINI_MODEL_CACHE = os.path.join(os.path.expanduser("~"), ".cache", "code_chatbot", "gemini_model.json")
+
+# Conversation memory: older turns are summarized once the buffer exceeds this many tokens
+HISTORY_MAX_TOKENS = 800
+# Maximum number of retrieved documents put into the linear RAG context
+MAX_CONTEXT_DOCS = 30
+# Hard token caps on the history sent with each request (agent / linear RAG)
+AGENT_HISTORY_TOKENS = 1500
+LINEAR_HISTORY_TOKENS = 3000
+# Cheap model used to summarize history when the chat provider is Groq
+GROQ_SUMMARIZER_MODEL = "llama-3.1-8b-instant"
+SUMMARY_PROMPT = (
+    "Progressively summarize the lines of conversation provided, adding onto the previous summary "
+    "and returning a new summary.\n\n"
+    "Current summary:\n{summary}\n\n"
+    "New lines of conversation:\n{new_lines}\n\n"
+    "New summary:"
+)
+
+# Weights for [vector_retriever, llm_retriever] when both are available
+ENSEMBLE_WEIGHTS = [0.6, 0.4]
+# Only ask the LLM retriever when the top vector result scores below this
+LLM_RETRIEVAL_THRESHOLD = 0.4
+
+
+def _install_llm_cache():
+    """
+    Install the process-wide SQLite LLM cache (identical (prompt, model) calls are
+    answered from disk) when enabled in the config (ENABLE_LLM_CACHE, off by default).
+    """
+    config = get_config()
+    if not config.enable_llm_cache:
+        return
+    try:
+        from langchain_community.cache import SQLiteCache
+        from langchain_core.globals import get_llm_cache, set_llm_cache
+    except ImportError as e:
+        logger.warning(f"LLM response cache unavailable: {e}")
+        return
+    if get_llm_cache() is not None:
+        return
+    try:
+        os.makedirs(os.path.dirname(config.llm_cache_path), exist_ok=True)
+        set_llm_cache(SQLiteCache(database_path=config.llm_cache_path))
+    except Exception as e:
+        logger.warning(f"Could not open LLM cache at {config.llm_cache_path}: {e}")
+
+
+@functools.lru_cache(maxsize=32)
+def _gemini_client(model_name: str, api_key: Optional[str]) -> ChatGoogleGenerativeAI:
+    """Process-wide Gemini client per (model, key), shared by every ChatEngine and fallback switch."""
+    return ChatGoogleGenerativeAI(
+        model=model_name,
+        google_api_key=api_key,
+        temperature=0.2,
+        convert_system_message_to_human=True
+    )
+
+
+@functools.lru_cache(maxsize=8)
+def _groq_client(model_name: str, api_key: Optional[str], temperature: float) -> ChatGroq:
+    """Process-wide Groq client per (model, key, temperature)."""
+    return ChatGroq(model=model_name, groq_api_key=api_key, temperature=temperature)
+
+
+def _list_gemini_models(api_key: Optional[str]) -> Optional[set]:
+    """
+    Names of the Gemini models this key can call generateContent on, from the
+    models.list endpoint (no generation quota used); None if they can't be listed.
+    """
+    try:
+        try:
+            from google import genai
+        except ImportError:
+            genai = None
+        if genai is not None:
+            models = genai.Client(api_key=api_key).models.list()
+            return {
+                m.name.split("/")[-1] for m in models
+                if "generateContent" in (getattr(m, "supported_actions", None) or ["generateContent"])
+            }
+        import google.generativeai as legacy_genai
+        legacy_genai.configure(api_key=api_key)
+        return {
+            m.name.split("/")[-1] for m in legacy_genai.list_models()
+            if "generateContent" in m.supported_generation_methods
+        }
+    except Exception as e:
+        logger.warning(f"Could not list Gemini models: {e}")
+        return None
+
+
+def _llm_cache_key(llm, messages: List) -> Optional[Tuple[str, str]]:
+    """
+    (prompt, llm_string) under which the chat model's invoke() files a call in the
+    global LLM cache, or None when no cache is installed. stream() bypasses that
+    cache, so the streaming path looks up and fills it itself with this key.
+    """
+    if get_llm_cache() is None:
+        return None
+    return dumps(messages), llm._get_llm_string()
+
+
+def _count_tokens(messages: List) -> int:
+    encoding = tiktoken.get_encoding("cl100k_base")
+    return sum(
+        len(encoding.encode(m.content if isinstance(m.content, str) else str(m.content)))
+        for m in messages
+    )
+
+
+class SummaryBufferMemory:
+    """
+    Conversation memory with recent turns kept verbatim and older turns folded into
+    a running summary once the buffer exceeds max_token_limit.
+
+    Summarizing costs an LLM call, so it runs on a background thread and never
+    delays an answer; until it finishes, the raw turns are kept (and the prompt
+    builders trim history by tokens anyway).
+    """
+
+    def __init__(self, llm, max_token_limit: int):
+        self.llm = llm
+        self.max_token_limit = max_token_limit
+        self.messages: List = []
+        self.summary = ""
+        self._lock = threading.Lock()
+        self._summarizing = False
+        self._generation = 0  # bumped by clear() so a running summary is discarded
+
+    def add_turn(self, question: str, answer: str):
+        with self._lock:
+            self.messages += [HumanMessage(content=question), AIMessage(content=answer)]
+            if self._summarizing or _count_tokens(self.messages) <= self.max_token_limit:
+                return
+            self._summarizing = True
+        threading.Thread(target=self._summarize, daemon=True).start()
+
+    def _summarize(self):
+        try:
+            with self._lock:
+                generation, summary, kept = self._generation, self.summary, list(self.messages)
+            # Fold the oldest turns until the rest fits
+            pruned = []
+            while len(kept) > 2 and _count_tokens(kept) > self.max_token_limit:
+                pruned += kept[:2]
+                kept = kept[2:]
+            if not pruned:
+                return
+            new_lines = "\n".join(
+                f"{'Human' if isinstance(m, HumanMessage) else 'AI'}: {m.content}" for m in pruned
+            )
+            reply = self.llm.invoke(SUMMARY_PROMPT.format(summary=summary, new_lines=new_lines))
+            with self._lock:
+                if generation == self._generation:
+                    self.summary = reply.content if isinstance(reply.content, str) else str(reply.content)
+                    # Turns added meanwhile sit after the pruned ones
+                    del self.messages[:len(pruned)]
+        except Exception as e:
+            logger.warning(f"Could not summarize chat history: {e}")
+        finally:
+            with self._lock:
+                self._summarizing = False
+
+    def load(self) -> List:
+        """Running summary (if any) followed by the recent messages."""
+        with self._lock:
+            head = [SystemMessage(content=self.summary)] if self.summary else []
+            return head + list(self.messages)
+
+    def clear(self):
+        with self._lock:
+            self.messages = []
+            self.summary = ""
+            self._generation += 1
+
+
 class ChatEngine:
     def __init__(
         self, 
@@ -58,12 +249,20 @@ class ChatEngine:
         
         # Track current model index for fallback
         self._gemini_model_index = 0
+        # Consecutive rate-limit switches and the backoff spent on them, until a turn succeeds
+        self._gemini_switches = 0
+        self._gemini_waited = 0
+        
+        # Provider-specific prompt templates (the provider is fixed for the session)
+        self._agent_prompt_tmpl = get_prompt_for_provider("system_agent", self.provider)
+        self._linear_prompt_tmpl = get_prompt_for_provider("linear_rag", self.provider)
         
         # Initialize LLM
+        _install_llm_cache()
         self.llm = self._get_llm()
         
-        # Initialize conversation history
-        self.chat_history = []
+        # Initialize conversation memory (recent turns verbatim, older turns summarized)
+        self.memory = SummaryBufferMemory(self._summarizer_llm(), HISTORY_MAX_TOKENS)
         
         # Build enhanced vector retriever 
         self.vector_retriever = build_enhanced_retriever(
@@ -71,6 +270,7 @@ class ChatEngine:
             llm=self.llm if use_multi_query else None, # Only for query expansion
             use_multi_query=use_multi_query,
             use_reranking=use_reranking,
+            provider=provider,
         )
         
         # Initialize LLM Retriever if files are available
@@ -78,22 +278,24 @@ class ChatEngine:
         if self.repo_files:
             try:
                 from code_chatbot.retrieval.llm_retriever import LLMRetriever
-                from langchain.retrievers import EnsembleRetriever
                 
                 logger.info(f"Initializing LLMRetriever with {len(self.repo_files)} files.")
-                self.llm_retriever = LLMRetriever(
+                self.llm_retriever = LLMRetriever.create(
                     llm=self.llm,
                     repo_files=self.repo_files,
                     top_k=3
                 )
                 
-                # Combine retrievers
-                self.retriever = EnsembleRetriever(
-                    retrievers=[self.vector_retriever, self.llm_retriever],
-                    weights=[0.6, 0.4]
+                # Combine retrievers; the LLM hop only runs when vector results look weak
+                self.retriever = AdaptiveEnsembleRetriever(
+                    vector_retriever=self.vector_retriever,
+                    llm_retriever=self.llm_retriever,
+                    weights=ENSEMBLE_WEIGHTS,
+                    confidence_threshold=LLM_RETRIEVAL_THRESHOLD,
+                    top_n=MAX_CONTEXT_DOCS
                 )
             except ImportError as e:
-                logger.warning(f"Could not load EnsembleRetriever or LLMRetriever: {e}")
+                logger.warning(f"Could not load LLMRetriever: {e}")
                 self.retriever = self.vector_retriever
         else:
             self.retriever = self.vector_retriever 
@@ -165,6 +367,14 @@ class ChatEngine:
                     GEMINI_MODELS_TO_TRY.remove(model_name)
                     GEMINI_MODELS_TO_TRY.insert(0, model_name)
             
+            # Start from the first preferred model the key actually has access to
+            winner = self._select_gemini_model(api_key, GEMINI_MODELS_TO_TRY)
+            if winner:
+                GEMINI_MODELS_TO_TRY.remove(winner)
+                GEMINI_MODELS_TO_TRY.insert(0, winner)
+                if winner in GEMINI_FALLBACK_MODELS:
+                    self._gemini_model_index = GEMINI_FALLBACK_MODELS.index(winner)
+            
             # Try each model until one works
             last_error = None
             last_working_model = None
@@ -172,12 +382,7 @@ class ChatEngine:
             for model_name in GEMINI_MODELS_TO_TRY:
                 try:
                     logger.info(f"Attempting to use Gemini model: {model_name}")
-                    llm = ChatGoogleGenerativeAI(
-                        model=model_name,
-                        google_api_key=api_key,
-                        temperature=0.2,
-                        convert_system_message_to_human=True
-                    )
+                    llm = self._get_or_create_gemini(model_name, api_key)
                     # Don't test the model here - it uses up quota!
                     # Just return it and let the actual call determine if it works
                     logger.info(f"Initialized Gemini model: {model_name}")
@@ -201,14 +406,78 @@ class ChatEngine:
                 if not os.getenv("GROQ_API_KEY"):
                     raise ValueError("Groq API Key is required")
             
-            return ChatGroq(
-                model=self.model_name or "llama-3.3-70b-versatile", 
-                groq_api_key=api_key,
-                temperature=0.2
-            )
+            return _groq_client(self.model_name or "llama-3.3-70b-versatile", api_key, 0.2)
         else:
             raise ValueError(f"Provider {self.provider} not supported. Only 'groq' and 'gemini' are supported.")
 
+    def _summarizer_llm(self):
+        """LLM used to summarize old conversation turns."""
+        if self.provider == "groq":
+            return _groq_client(GROQ_SUMMARIZER_MODEL, self.api_key or os.getenv("GROQ_API_KEY"), 0)
+        return self.llm
+
+    @property
+    def chat_history(self) -> List:
+        """Raw (unsummarized) messages currently held in memory."""
+        return self.memory.messages
+
+    def _history_messages(self) -> List:
+        """Running summary (if any) followed by the recent messages."""
+        return self.memory.load()
+
+    @staticmethod
+    def _trim_history(messages: List, budget_tokens: int) -> List:
+        """Keep the newest messages whose combined token count fits in budget_tokens."""
+        encoding = tiktoken.get_encoding("cl100k_base")
+        kept = []
+        used = 0
+        for msg in reversed(messages):
+            content = msg.content if isinstance(msg.content, str) else str(msg.content)
+            used += len(encoding.encode(content))
+            if used > budget_tokens:
+                break
+            kept.append(msg)
+        kept.reverse()
+        return kept
+
+    def _remember(self, question: str, answer: str):
+        """Save a turn to memory; older turns are summarized in the background if over budget."""
+        self.memory.add_turn(question, answer)
+        # A completed turn means the rate limiting is over: the next one backs off from scratch
+        self._gemini_switches = 0
+        self._gemini_waited = 0
+
+    def _select_gemini_model(self, api_key: Optional[str], candidates: List[str]) -> Optional[str]:
+        """
+        Pick the first candidate listed as available for this key.
+        Reuses the cached choice for the same candidate list, otherwise lists the
+        models (no generate calls, so no quota) and caches the result. The cache
+        is dropped when the model gets rate limited (see _try_next_gemini_model).
+        """
+        try:
+            with open(GEMINI_MODEL_CACHE, "r") as f:
+                cached = json.load(f)
+            if cached.get("candidates") == candidates and cached.get("winner") in candidates:
+                logger.info(f"Using cached Gemini model: {cached['winner']}")
+                return cached["winner"]
+        except (OSError, ValueError):
+            pass
+
+        available = _list_gemini_models(api_key or os.getenv("GOOGLE_API_KEY"))
+        if not available:
+            return None
+        winner = next((name for name in candidates if name in available), None)
+
+        if winner:
+            logger.info(f"Selected Gemini model: {winner}")
+            try:
+                os.makedirs(os.path.dirname(GEMINI_MODEL_CACHE), exist_ok=True)
+                with open(GEMINI_MODEL_CACHE, "w") as f:
+                    json.dump({"candidates": candidates, "winner": winner}, f)
+            except OSError as e:
+                logger.warning(f"Could not cache Gemini model choice: {e}")
+        return winner
+
     def _try_next_gemini_model(self) -> bool:
         """
         Try to switch to the next Gemini model in the fallback list.
@@ -217,24 +486,34 @@ class ChatEngine:
         if self.provider != "gemini":
             return False
         
-        self._gemini_model_index += 1
-        
-        if self._gemini_model_index >= len(GEMINI_FALLBACK_MODELS):
-            logger.error("All Gemini models exhausted!")
-            return False
+        # The remembered choice just failed; choose afresh on the next startup
+        try:
+            os.remove(GEMINI_MODEL_CACHE)
+        except OSError:
+            pass
         
-        next_model = GEMINI_FALLBACK_MODELS[self._gemini_model_index]
-        logger.info(f"Switching to next Gemini model: {next_model} (index {self._gemini_model_index})")
+        # Exponential backoff that grows with each consecutive rate limit, so the quota
+        # window can recover; capped so a user isn't kept waiting past the budget overall
+        delay = min(2 ** self._gemini_switches, GEMINI_SWITCH_WAIT_BUDGET - self._gemini_waited)
+        if delay > 0 and self._gemini_model_index + 1 < len(GEMINI_FALLBACK_MODELS):
+            time.sleep(delay)
+            self._gemini_waited += delay
+        self._gemini_switches += 1
         
         api_key = self.api_key or os.getenv("GOOGLE_API_KEY")
-        try:
-            self.llm = ChatGoogleGenerativeAI(
-                model=next_model,
-                google_api_key=api_key,
-                temperature=0.2,
-                convert_system_message_to_human=True
-            )
+        for index in range(self._gemini_model_index + 1, len(GEMINI_FALLBACK_MODELS)):
+            self._gemini_model_index = index
+            next_model = GEMINI_FALLBACK_MODELS[index]
+            
+            logger.info(f"Switching to next Gemini model: {next_model} (index {index})")
+            try:
+                self.llm = self._get_or_create_gemini(next_model, api_key)
+            except Exception as e:
+                logger.error(f"Failed to switch to model {next_model}: {e}")
+                continue
+            
             self.model_name = next_model
+            self.memory.llm = self.llm
             
             # Rebuild agent if using agents
             if self.use_agent:
@@ -249,9 +528,14 @@ class ChatEngine:
                     logger.warning(f"Could not rebuild agent: {e}")
             
             return True
-        except Exception as e:
-            logger.error(f"Failed to switch to model {next_model}: {e}")
-            return self._try_next_gemini_model()  # Recursively try next
+        
+        self._gemini_model_index = len(GEMINI_FALLBACK_MODELS)
+        logger.error("All Gemini models exhausted!")
+        return False
+
+    def _get_or_create_gemini(self, model_name: str, api_key: Optional[str] = None) -> ChatGoogleGenerativeAI:
+        """Return the shared client for a Gemini model, creating it on first use."""
+        return _gemini_client(model_name, api_key or self.api_key or os.getenv("GOOGLE_API_KEY"))
 
     def _build_rag_chain(self):
         """Builds a simplified RAG chain with history-aware retrieval."""
@@ -259,6 +543,14 @@ class ChatEngine:
         # The history-aware retriever will be implemented in the chat method
         return None  # We'll handle retrieval manually in chat()
 
+    def _retrieve(self, query: str) -> List[Any]:
+        """Retrieve documents for a query."""
+        return self.retriever.invoke(query)
+
+    def _top_n(self, query: str, n: int) -> List[Any]:
+        """Retrieve documents for a query and keep the first n (retrieval itself is not limited)."""
+        return self._retrieve(query)[:n]
+
     def _contextualize_query(self, question: str, history: List) -> str:
         """Contextualize query based on chat history."""
         if not history:
@@ -281,91 +573,90 @@ class ChatEngine:
         Ask a question to the chatbot. 
         Uses Agentic Workflow if enabled, otherwise falls back to Linear RAG.
         """
-        try:
-            # 1. Agentic Mode
-            if self.use_agent and self.agent_executor:
-                logger.info("Executing Agentic Workflow...")
+        # Each rate-limit switch to another Gemini model retries the whole turn
+        while True:
+            try:
+                # 1. Agentic Mode
+                if self.use_agent and self.agent_executor:
+                    logger.info("Executing Agentic Workflow...")
                 
-                # Contextualize with history
-                # Use comprehensive system prompt for high-quality answers
-                from code_chatbot.core.prompts import get_prompt_for_provider
-                sys_content = get_prompt_for_provider("system_agent", self.provider).format(repo_name=self.repo_name)
-                system_msg = SystemMessage(content=sys_content)
+                    # Contextualize with history
+                    # Use comprehensive system prompt for high-quality answers
+                    sys_content = self._agent_prompt_tmpl.format(repo_name=self.repo_name)
+                    system_msg = SystemMessage(content=sys_content)
                 
-                # Token Optimization: Only pass last 4 messages (2 turns) to keep context light.
-                recent_history = self.chat_history[-4:] if self.chat_history else []
+                    # Token Optimization: summary of older turns + recent turns, capped by tokens
+                    recent_history = self._trim_history(self._history_messages(), AGENT_HISTORY_TOKENS)
                 
-                inputs = {
-                    "messages": [system_msg] + recent_history + [HumanMessage(content=question)]
-                }
+                    inputs = {
+                        "messages": [system_msg] + recent_history + [HumanMessage(content=question)]
+                    }
                 
-                # Run the graph
-                try:
-                    final_state = self.agent_executor.invoke(inputs, config={"recursion_limit": 20})
+                    # Run the graph
+                    try:
+                        final_state = self.agent_executor.invoke(inputs, config={"recursion_limit": 20})
                     
-                    # Extract Answer
-                    messages = final_state["messages"]
-                    raw_content = messages[-1].content
+                        # Extract Answer
+                        messages = final_state["messages"]
+                        raw_content = messages[-1].content
                     
-                    # Handle Gemini's multi-part content
-                    if isinstance(raw_content, list):
-                        answer = ""
-                        for block in raw_content:
-                            if isinstance(block, dict) and block.get('type') == 'text':
-                                answer += block.get('text', '')
-                            elif isinstance(block, str):
-                                answer += block
-                        answer = answer.strip() or str(raw_content)
-                    else:
-                        answer = raw_content
+                        # Handle Gemini's multi-part content
+                        if isinstance(raw_content, list):
+                            answer = ""
+                            for block in raw_content:
+                                if isinstance(block, dict) and block.get('type') == 'text':
+                                    answer += block.get('text', '')
+                                elif isinstance(block, str):
+                                    answer += block
+                            answer = answer.strip() or str(raw_content)
+                        else:
+                            answer = raw_content
                     
-                    # CLEANING: Remove hallucinated source chips
-                    answer = self._clean_response(answer)
+                        # CLEANING: Remove hallucinated source chips
+                        answer = self.clean_response(answer)
 
-                    # Update history
-                    self.chat_history.append(HumanMessage(content=question))
-                    self.chat_history.append(AIMessage(content=answer))
-                    if len(self.chat_history) > 20: self.chat_history = self.chat_history[-20:]
+                        # Update history
+                        self._remember(question, answer)
                     
-                    return answer, []
+                        return answer, []
                     
-                except Exception as e:
-                    # Fallback for Groq/LLM Tool Errors & Rate Limits
-                    error_str = str(e)
+                    except Exception as e:
+                        # Fallback for Groq/LLM Tool Errors & Rate Limits
+                        error_str = str(e)
                     
-                    # Check if it's a rate limit error
-                    if any(err in error_str for err in ["429", "RESOURCE_EXHAUSTED", "quota"]):
-                        logger.warning(f"Rate limit hit on {self.model_name}: {error_str[:100]}")
+                        # Check if it's a rate limit error
+                        if any(err in error_str for err in ["429", "RESOURCE_EXHAUSTED", "quota"]):
+                            logger.warning(f"Rate limit hit on {self.model_name}: {error_str[:100]}")
                         
-                        # Try switching to next Gemini model
-                        if self.provider == "gemini" and self._try_next_gemini_model():
-                            logger.info(f"Switched to {self.model_name}, retrying...")
-                            return self.chat(question)  # Retry with new model
-                        else:
-                            logger.warning("No more models to try, falling back to Linear RAG")
-                            return self._linear_chat(question)
+                            # Try switching to next Gemini model
+                            if self.provider == "gemini" and self._try_next_gemini_model():
+                                logger.info(f"Switched to {self.model_name}, retrying...")
+                                continue  # Retry with new model
+                            else:
+                                logger.warning("No more models to try, falling back to Linear RAG")
+                                return self._linear_chat(question)
                     
-                    # Handle tool use errors
-                    if any(err in error_str for err in ["tool_use_failed", "invalid_request_error", "400"]):
-                        logger.warning(f"Agent failed ({error_str}), falling back to Linear RAG.")
-                        return self._linear_chat(question)
-                    raise e 
-
-            # 2. Linear RAG Mode (Fallback)
-            return self._linear_chat(question)
+                        # Handle tool use errors
+                        if any(err in error_str for err in ["tool_use_failed", "invalid_request_error", "400"]):
+                            logger.warning(f"Agent failed ({error_str}), falling back to Linear RAG.")
+                            return self._linear_chat(question)
+                        raise e 
+
+                # 2. Linear RAG Mode (Fallback)
+                return self._linear_chat(question)
             
-        except Exception as e:
-            # Check for rate limits in outer exception too
-            error_str = str(e)
-            if any(err in error_str for err in ["429", "RESOURCE_EXHAUSTED", "quota"]):
-                if self.provider == "gemini" and self._try_next_gemini_model():
-                    logger.info(f"Switched to {self.model_name} after outer error, retrying...")
-                    return self.chat(question)
+            except Exception as e:
+                # Check for rate limits in outer exception too
+                error_str = str(e)
+                if any(err in error_str for err in ["429", "RESOURCE_EXHAUSTED", "quota"]):
+                    if self.provider == "gemini" and self._try_next_gemini_model():
+                        logger.info(f"Switched to {self.model_name} after outer error, retrying...")
+                        continue
             
-            logger.error(f"Error during chat: {e}", exc_info=True)
-            return f"Error: {str(e)}", []
+                logger.error(f"Error during chat: {e}", exc_info=True)
+                return f"Error: {str(e)}", []
     
-    def _clean_response(self, text: str) -> str:
+    def clean_response(self, text: str) -> str:
         """Clean response from hallucinated HTML/CSS artifacts."""
         if not text:
             return ""
@@ -387,31 +678,43 @@ class ChatEngine:
         if not messages:
              return "I don't have any information about this codebase. Please make sure the codebase has been indexed properly.", []
 
-        # Get response from LLM
+        # Get response from LLM (joins the token stream; history is updated at stream end).
+        # _stream_answer already switches Gemini models on a rate limit before the first token.
         try:
-            response_msg = self.llm.invoke(messages)
-            answer = self._clean_response(response_msg.content)
+            answer = self.clean_response("".join(self._stream_answer(question, messages)))
         except Exception as e:
-            # Check for Rate Limit in Linear Chat
-            error_str = str(e)
-            if any(err in error_str for err in ["429", "RESOURCE_EXHAUSTED", "quota"]):
-                 if self.provider == "gemini" and self._try_next_gemini_model():
-                     logger.info(f"Linear RAG: Switched to {self.model_name} due to rate limit, retrying...")
-                     return self._linear_chat(question) # Retry with new model
-            
             logger.error(f"Error in linear chat invoke: {e}")
             return f"Error consuming LLM: {e}", []
         
-        # Update chat history
-        self.chat_history.append(HumanMessage(content=question))
-        self.chat_history.append(AIMessage(content=answer))
-        
-        # Keep history manageable (last 20 messages)
-        if len(self.chat_history) > 20:
-            self.chat_history = self.chat_history[-20:]
-        
         return answer, sources
 
+    def batch_chat(self, questions: List[str], max_concurrency: int = 4) -> List[Tuple[str, List[dict]]]:
+        """
+        Answer independent questions at once with linear RAG.
+        Retrieval runs on a thread pool and the LLM calls go out in one llm.batch,
+        so wall time is roughly the slowest question rather than the sum. Each
+        question sees the same prior history; the new turns are saved in order afterwards.
+        """
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+            prepared = list(pool.map(self._prepare_chat_context, questions))
+
+        answers = ["I don't have any information about this codebase. Please make sure the codebase has been indexed properly."] * len(questions)
+        pending = [i for i, (messages, _, _) in enumerate(prepared) if messages]
+        replies = self.llm.batch(
+            [prepared[i][0] for i in pending],
+            config={"max_concurrency": max_concurrency},
+            return_exceptions=True,
+        )
+        for i, reply in zip(pending, replies):
+            if isinstance(reply, Exception):
+                logger.error(f"Error in batch chat invoke: {reply}")
+                answers[i] = f"Error consuming LLM: {reply}"
+                continue
+            answers[i] = self.clean_response(reply.content if isinstance(reply.content, str) else str(reply.content))
+            self._remember(questions[i], answers[i])
+
+        return [(answer, sources) for answer, (_, sources, _) in zip(answers, prepared)]
+
     def _generate_file_tree_str(self):
         """Generate a string representation of the file tree."""
         if not self.repo_files:
@@ -439,19 +742,25 @@ class ChatEngine:
             query_for_retrieval = f"{self.chat_history[-1].content} {question}"
             
         # Increase retrieval limit to 30 docs since Gemini has large context
-        # FIXED: Use .invoke() instead of .get_relevant_documents() (deprecated/removed in LC 0.1)
-        docs = self.retriever.invoke(query_for_retrieval)
+        docs = self._top_n(query_for_retrieval, MAX_CONTEXT_DOCS)
         
         if not docs:
             # Return empty context if no docs found
             return None, [], ""
             
-        # Build context from documents - Use FULL content, not truncated
+        # Build context and sources from documents in one pass - Use FULL content, not truncated
         context_parts = []
-        for doc in docs[:30]: # Use top 30 documents
-            file_path = doc.metadata.get('file_path', 'unknown')
-            content = doc.page_content
-            context_parts.append(f"File: {file_path}\nWait, content:\n{content}\n---")
+        sources = []
+        for doc in docs:
+            metadata = doc.metadata
+            file_path = metadata.get("file_path")
+            context_parts.append(f"File: {file_path or 'unknown'}\nWait, content:\n{doc.page_content}\n---")
+            
+            source_path = file_path or metadata.get("source", "unknown")
+            sources.append({
+                "file_path": source_path,
+                "url": metadata.get("url", f"file://{source_path}"),
+            })
             
         context_text = "\n\n".join(context_parts)
         
@@ -459,19 +768,8 @@ class ChatEngine:
         file_tree = self._generate_file_tree_str()
         full_context = f"{file_tree}\n\nRETRIEVED CONTEXT:\n{context_text}"
         
-        # Extract sources
-        sources = []
-        for doc in docs[:30]:
-            file_path = doc.metadata.get("file_path") or doc.metadata.get("source", "unknown")
-            sources.append({
-                "file_path": file_path,
-                "url": doc.metadata.get("url", f"file://{file_path}"),
-            })
-        
         # Build prompt with history - use provider-specific prompt
-        from code_chatbot.core.prompts import get_prompt_for_provider
-        base_prompt = get_prompt_for_provider("linear_rag", self.provider)
-        qa_system_prompt = base_prompt.format(
+        qa_system_prompt = self._linear_prompt_tmpl.format(
             repo_name=self.repo_name,
             context=full_context
         )
@@ -479,9 +777,8 @@ class ChatEngine:
         # Build messages with history
         messages = [SystemMessage(content=qa_system_prompt)]
         
-        # Add chat history
-        for msg in self.chat_history[-10:]:  # Last 10 messages for context
-            messages.append(msg)
+        # Add chat history (summary of older turns + recent turns)
+        messages.extend(self._trim_history(self._history_messages(), LINEAR_HISTORY_TOKENS))
         
         # Add current question
         messages.append(HumanMessage(content=question))
@@ -497,24 +794,72 @@ class ChatEngine:
             def empty_gen(): yield "I don't have any information about this codebase."
             return empty_gen(), []
 
-        # Update history with USER message immediately
-        self.chat_history.append(HumanMessage(content=question))
-        if len(self.chat_history) > 20: self.chat_history = self.chat_history[-20:]
+        return self._stream_answer(question, messages), sources
+
+    def chat_stream(self, question: str) -> Iterator[str]:
+        """Linear RAG answer as a token stream (use stream_chat to also get sources)."""
+        generator, _ = self.stream_chat(question)
+        yield from generator
+
+    def _stream_answer(self, question: str, messages: List) -> Iterator[str]:
+        """
+        Yield answer tokens from the LLM, then save the full turn to history.
+        A rate limit before the first token switches to the next Gemini model and
+        restarts the stream, like the blocking path does. With the LLM cache enabled,
+        a cached answer is replayed as one chunk and new answers are stored in it.
+        """
+        key = _llm_cache_key(self.llm, messages)
+        cached = get_llm_cache().lookup(*key) if key else None
+        if cached:
+            # Same prompt and model answered before: replay it instead of streaming a new call
+            answer = cached[0].text
+            yield answer
+            self._remember(question, self.clean_response(answer))
+            return
         
-        # Generator wrapper to capture full response for history
-        def response_generator():
-            full_response = ""
-            for chunk in self.llm.stream(messages):
-                content = chunk.content
-                full_response += content
-                yield content
-            
-            # Update history with AI message after generation
-            clean_full_response = self._clean_response(full_response)
-            self.chat_history.append(AIMessage(content=clean_full_response))
-            
-        return response_generator(), sources
+        parts = []
+        while True:
+            try:
+                for chunk in self.llm.stream(messages):
+                    parts.append(chunk.content)
+                    yield chunk.content
+                break
+            except Exception as e:
+                error_str = str(e)
+                if (
+                    not parts
+                    and any(err in error_str for err in ["429", "RESOURCE_EXHAUSTED", "quota"])
+                    and self.provider == "gemini"
+                    and self._try_next_gemini_model()
+                ):
+                    logger.info(f"Stream: switched to {self.model_name} due to rate limit, retrying...")
+                    continue
+                raise
+        
+        answer = "".join(parts)
+        # Keyed on the model that answered, which a rate-limit switch may have changed
+        key = _llm_cache_key(self.llm, messages)
+        if key:
+            get_llm_cache().update(*key, [ChatGeneration(message=AIMessage(content=answer))])
+        
+        # Update history with the full turn after generation
+        self._remember(question, self.clean_response(answer))
             
+    def warmup(self, query: str = "main entry point"):
+        """
+        Run one retrieval so the first real question doesn't pay cold-start costs
+        (embedding model, vector store, reranker). Makes no chat LLM call and
+        leaves history untouched; with multi-query on, only the base retriever is used.
+        """
+        retriever = self.base_retriever if self.use_multi_query else self.vector_retriever
+        try:
+            docs = retriever.invoke(query)
+            if self.use_reranking and docs:
+                # Retrieval skips the cross-encoder when few documents come back
+                get_reranker().rerank(query, docs[:2], top_k=1)
+        except Exception as e:
+            logger.warning(f"Warmup retrieval failed: {e}")
+
     def clear_memory(self):
         """Clear the conversation history."""
-        self.chat_history.clear()
+        self.memory.clear()
@@ -1,39 +1,256 @@
+import functools
+import hashlib
 import logging
-from typing import List
+import os
+import platform
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, List, Optional, Tuple
+import numpy as np
+import torch
 from langchain_core.documents import Document
 from sentence_transformers import CrossEncoder
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_RERANKER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+ONNX_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "code_chatbot")
+
+_MODEL_LOCK = threading.Lock()
+
+_QUOTED_RE = re.compile(r'["\'].+["\']')
+_IDENTIFIER_RE = re.compile(r'[A-Za-z_][\w\./]*')
+
+
+def _digest(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8", "ignore"), digest_size=8).digest()
+
+
+class ScoreCache:
+    """
+    Bounded LRU of cross-encoder scores keyed by (query hash, document hash).
+    Thread-safe: the shared reranker scores from several rerank workers at once.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._scores: "OrderedDict[Tuple[bytes, bytes], float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(query_hash: bytes, text: str) -> Tuple[bytes, bytes]:
+        return query_hash, _digest(text)
+
+    def get(self, key: Tuple[bytes, bytes]) -> Optional[float]:
+        with self._lock:
+            score = self._scores.get(key)
+            if score is not None:
+                self._scores.move_to_end(key)
+            return score
+
+    def put(self, key: Tuple[bytes, bytes], score: float):
+        with self._lock:
+            self._scores[key] = score
+            self._scores.move_to_end(key)
+            if len(self._scores) > self.maxsize:
+                self._scores.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+
+@functools.lru_cache(maxsize=4)
+def _load_cross_encoder(model_name: str) -> CrossEncoder:
+    model = CrossEncoder(model_name)
+    if torch.cuda.is_available():
+        # fp16 halves weight/activation bandwidth on GPU. Some MiniLM variants fail in
+        # half precision, so settle the dtype here (under _MODEL_LOCK) with a test pair,
+        # never while rerank workers share the model.
+        model.model.half()
+        try:
+            model.predict([["query", "document"]], show_progress_bar=False)
+        except RuntimeError as e:
+            logger.warning(f"Reranker fp16 inference failed ({e}), using fp32")
+            model.model.float()
+    return model
+
+
+def _get_cross_encoder(model_name: str) -> CrossEncoder:
+    """Shared CrossEncoder per model name, so every ChatEngine reuses one copy of the weights."""
+    with _MODEL_LOCK:
+        return _load_cross_encoder(model_name)
+
+
+def _quantization_config():
+    """Dynamic INT8 config tuned for this CPU (VNNI when available)."""
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return AutoQuantizationConfig.arm64(is_static=False, per_channel=False)
+    try:
+        with open("/proc/cpuinfo") as f:
+            cpu_flags = f.read()
+    except OSError:
+        cpu_flags = ""
+    if "avx512_vnni" in cpu_flags:
+        return AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+    return AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+
+
+def _topk_idx(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first; O(N) partition instead of a full sort."""
+    if k >= len(scores):
+        return np.argsort(-scores, kind="stable")
+    idx = np.argpartition(-scores, k)[:k]
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+def _is_literal_query(query: str) -> bool:
+    """True for quoted phrases and bare identifiers / file names (e.g. `utils.py`)."""
+    q = query.strip()
+    return bool(_QUOTED_RE.fullmatch(q) or _IDENTIFIER_RE.fullmatch(q))
+
+
 class Reranker:
     """
     Uses a Cross-Encoder to re-rank documents retrieved by the vector store.
     This significantly improves precision by scoring the query against each document directly.
+
+    Scores are cached per (query, document text) pair, so chunks that come back
+    again for a repeated query skip the cross-encoder forward pass.
+
+    backend="onnx" (or RERANKER_BACKEND=onnx) serves an INT8-quantized ONNX export
+    of the model on CPU; it needs `optimum[onnxruntime]` and falls back to the
+    PyTorch CrossEncoder when that is not installed.
     """
-    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"):
+    def __init__(
+        self,
+        model_name: str = DEFAULT_RERANKER_MODEL,
+        cache_size: int = 10000,
+        backend: Optional[str] = None,
+    ):
         logger.info(f"Loading Reranker model: {model_name}")
-        self.model = CrossEncoder(model_name)
-    
-    def rerank(self, query: str, documents: List[Document], top_k: int = 5) -> List[Document]:
+        self.model_name = model_name
+        self.batch_size = 64
+        self.backend = (backend or os.getenv("RERANKER_BACKEND", "torch")).lower()
+        self._onnx: Optional[Tuple[Any, Any]] = None
+        if self.backend == "onnx":
+            try:
+                self._onnx = self._load_onnx_model()
+            except ImportError as e:
+                logger.warning(f"ONNX reranker unavailable ({e}), using PyTorch CrossEncoder")
+                self.backend = "torch"
+
+        self.model = _get_cross_encoder(model_name) if self._onnx is None else None
+        self.score_cache = ScoreCache(maxsize=cache_size)
+        # Skip the model for literal lookups that already hit a file by name
+        self.literal_short_circuit = True
+
+    def _load_onnx_model(self) -> Tuple[Any, Any]:
+        """Export the model to ONNX, quantize it to INT8 once, and open a CPU session."""
+        import onnxruntime as ort
+        from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+        from transformers import AutoTokenizer
+
+        model_dir = os.path.join(ONNX_CACHE_DIR, self.model_name.replace("/", "__"))
+        quantized_path = os.path.join(model_dir, "model_quantized.onnx")
+        if not os.path.exists(quantized_path):
+            logger.info(f"Exporting {self.model_name} to ONNX (INT8) in {model_dir}")
+            onnx_model = ORTModelForSequenceClassification.from_pretrained(self.model_name, export=True)
+            onnx_model.save_pretrained(model_dir)
+            ORTQuantizer.from_pretrained(onnx_model).quantize(
+                save_dir=model_dir, quantization_config=_quantization_config()
+            )
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = os.cpu_count() or 1
+        session = ort.InferenceSession(quantized_path, options, providers=["CPUExecutionProvider"])
+        tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        return session, tokenizer
+
+    def _predict_onnx(self, pairs: List[List[str]], batch_size: int) -> np.ndarray:
+        session, tokenizer = self._onnx
+        input_names = [i.name for i in session.get_inputs()]
+        outputs = []
+        for start in range(0, len(pairs), batch_size):
+            batch = pairs[start:start + batch_size]
+            encoded = tokenizer(
+                [q for q, _ in batch], [d for _, d in batch],
+                padding=True, truncation=True, return_tensors="np",
+            )
+            logits = session.run(None, {name: encoded[name] for name in input_names})[0]
+            # Match CrossEncoder: sigmoid for single-logit models, positive class otherwise
+            outputs.append(1 / (1 + np.exp(-logits[:, 0])) if logits.shape[1] == 1 else logits[:, 1])
+        return np.concatenate(outputs)
+
+    def _predict(self, pairs: List[List[str]], batch_size: Optional[int] = None):
+        batch_size = batch_size or self.batch_size
+        if self._onnx is not None:
+            return self._predict_onnx(pairs, batch_size)
+        return self.model.predict(
+            pairs, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False
+        )
+
+    def _score(self, query: str, texts: List[str], batch_size: Optional[int] = None) -> List[float]:
+        """Score (query, text) pairs, running the model only on cache misses."""
+        q_hash = _digest(query)
+        keys = [ScoreCache.key(q_hash, text) for text in texts]
+
+        scores: List[float] = [0.0] * len(texts)
+        missing = []
+        for i, key in enumerate(keys):
+            cached = self.score_cache.get(key)
+            if cached is None:
+                missing.append(i)
+            else:
+                scores[i] = cached
+
+        if missing:
+            # One batched forward pass for all misses
+            predicted = self._predict([[query, texts[i]] for i in missing], batch_size)
+            for i, score in zip(missing, predicted):
+                scores[i] = float(score)
+                self.score_cache.put(keys[i], scores[i])
+
+        logger.debug(f"Reranker cache: {len(texts) - len(missing)}/{len(texts)} hits")
+        return scores
+
+    def rerank(
+        self, query: str, documents: List[Document], top_k: int = 5, batch_size: Optional[int] = None
+    ) -> List[Document]:
+        """
+        Score all documents against the query in batched cross-encoder calls and return the top_k.
+        Callers should pass the full candidate set (e.g. the union of multi-query results)
+        in one call so the model sees large batches; batch_size defaults to self.batch_size.
+        """
         if not documents:
             return []
-            
-        # Prepare pairs for scoring: [[query, doc_text], ...]
-        pairs = [[query, doc.page_content] for doc in documents]
-        
-        # Predict scores
-        scores = self.model.predict(pairs)
-        
-        # Attach scores to docs and sort
-        scored_docs = []
-        for i, doc in enumerate(documents):
-            # We can store the score in metadata if needed
-            doc.metadata["rerank_score"] = float(scores[i])
-            scored_docs.append((doc, scores[i]))
-            
-        # Sort by score descending
-        scored_docs.sort(key=lambda x: x[1], reverse=True)
-        
-        # Return top_k
-        top_docs = [doc for doc, score in scored_docs[:top_k]]
-        return top_docs
+
+        if self.literal_short_circuit and _is_literal_query(query):
+            token = query.strip().strip("\"'")
+            paths = (doc.metadata.get("file_path", "") for doc in documents)
+            if any(token == path or token == os.path.basename(path) for path in paths):
+                logger.info(f"Literal query '{token}' matches a file name, skipping rerank")
+                top_docs = documents[:top_k]
+                # Unscored: leave no rerank_score behind for confidence checks to trust
+                for doc in top_docs:
+                    doc.metadata.pop("rerank_score", None)
+                return top_docs
+
+        # Predict scores for [query, doc_text] pairs
+        scores = self._score(query, [doc.page_content for doc in documents], batch_size)
+
+        # Attach scores to docs
+        for doc, score in zip(documents, scores):
+            doc.metadata["rerank_score"] = score
+
+        # Select top_k by score descending
+        top_idx = _topk_idx(np.asarray(scores, dtype=np.float32), top_k)
+        return [documents[i] for i in top_idx]
+
+
+@functools.lru_cache(maxsize=1)
+def get_reranker() -> Reranker:
+    """Process-wide default Reranker, so Streamlit reruns and new engines reuse it and its score cache."""
+    return Reranker()
@@ -1,11 +1,14 @@
 """Wrapper retriever that adds reranking and multi-query support."""
 
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional, Any
 from langchain_core.retrievers import BaseRetriever
 from langchain_core.documents import Document
 from langchain_core.callbacks import CallbackManagerForRetrieverRun
-from code_chatbot.retrieval.reranker import Reranker
+from langchain_core.prompts import ChatPromptTemplate
+from code_chatbot.core.prompts import get_prompt_for_provider
+from code_chatbot.retrieval.reranker import Reranker, get_reranker
 
 # Try to import MultiQueryRetriever - may not be available in all versions
 try:
@@ -18,6 +21,44 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Reciprocal Rank Fusion constant (same default as LangChain's EnsembleRetriever)
+RRF_C = 60
+
+# Cross-encoder inference runs here (it releases the GIL); two workers cap how many
+# sessions run the model at once instead of oversubscribing the CPU.
+_RERANK_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="rerank")
+
+
+def _rrf_fuse(doc_lists: List[List[Document]], weights: List[float], c: int = RRF_C) -> List[Document]:
+    """Weighted Reciprocal Rank Fusion, deduplicating documents by content."""
+    scores = {}
+    docs_by_key = {}
+    for docs, weight in zip(doc_lists, weights):
+        for rank, doc in enumerate(docs, start=1):
+            key = doc.page_content
+            scores[key] = scores.get(key, 0.0) + weight / (rank + c)
+            docs_by_key.setdefault(key, doc)
+    return [docs_by_key[key] for key in sorted(scores, key=scores.get, reverse=True)]
+
+
+def _dedupe(docs: List[Document]) -> List[Document]:
+    """Drop repeated chunks (e.g. the same chunk returned for several expanded queries)."""
+    seen = set()
+    unique = []
+    for doc in docs:
+        key = (
+            doc.metadata.get("source"),
+            doc.metadata.get("start_line"),
+            doc.metadata.get("end_line"),
+            hash(doc.page_content),
+        )
+        if key not in seen:
+            seen.add(key)
+            unique.append(doc)
+    if len(unique) < len(docs):
+        logger.info(f"Deduplicated {len(docs)} -> {len(unique)} documents before reranking")
+    return unique
+
 
 class RerankingRetriever(BaseRetriever):
     """Wraps a base retriever and applies reranking to results."""
@@ -42,20 +83,89 @@ class RerankingRetriever(BaseRetriever):
         
         if not docs:
             return []
+        docs = _dedupe(docs)
+        if len(docs) <= self.top_k:
+            logger.info(f"Skipping rerank: {len(docs)} documents already within top_k={self.top_k}")
+            return docs
         
         # Rerank
-        reranked_docs = self.reranker.rerank(query, docs, top_k=self.top_k)
+        future = _RERANK_POOL.submit(self.reranker.rerank, query, docs, self.top_k)
+        reranked_docs = future.result()
         logger.info(f"Reranked to {len(reranked_docs)} top documents")
         
         return reranked_docs
 
 
+class AdaptiveEnsembleRetriever(BaseRetriever):
+    """
+    Vector retrieval first; the LLM retriever (a full model call) only runs when
+    the top vector result scores below `confidence_threshold`. Results from both
+    are then fused with weighted RRF, like LangChain's EnsembleRetriever.
+    """
+    
+    vector_retriever: BaseRetriever
+    llm_retriever: BaseRetriever
+    weights: List[float] = [0.6, 0.4]
+    confidence_threshold: float = 0.4
+    top_n: Optional[int] = None
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _is_confident(self, docs: List[Document]) -> bool:
+        if not docs:
+            return False
+        # Rerank score when reranking is on, otherwise a vector-store score if present
+        metadata = docs[0].metadata
+        score = metadata["rerank_score"] if "rerank_score" in metadata else metadata.get("score")
+        if score is None:
+            # Nothing to judge the vector results by (no reranker, unscored store,
+            # or a literal match the reranker skipped): don't skip the LLM retriever
+            logger.debug("Top vector result has no score, running LLM retriever")
+            return False
+        return score >= self.confidence_threshold
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        docs = self.vector_retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        if self._is_confident(docs):
+            logger.info("Vector results are confident, skipping LLM retriever")
+            return docs[:self.top_n]
+        llm_docs = self.llm_retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        return _rrf_fuse([docs, llm_docs], self.weights)[:self.top_n]
+
+
+if MultiQueryRetriever is not None:
+    class BoundedMultiQueryRetriever(MultiQueryRetriever):
+        """MultiQueryRetriever that retrieves sub-queries in parallel, at most `max_parallel` at once."""
+        
+        max_parallel: int = 3
+
+        def retrieve_documents(
+            self, queries: List[str], run_manager: CallbackManagerForRetrieverRun
+        ) -> List[Document]:
+            def retrieve(query: str) -> List[Document]:
+                return self.retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+
+            # Retrieval waits on embedding calls and the vector store, so threads overlap it;
+            # map keeps the sub-queries' order
+            with ThreadPoolExecutor(max_workers=max(1, min(self.max_parallel, len(queries)))) as pool:
+                document_lists = list(pool.map(retrieve, queries))
+            return [doc for docs in document_lists for doc in docs]
+else:
+    BoundedMultiQueryRetriever = None  # type: ignore
+
+
 def build_enhanced_retriever(
     base_retriever: BaseRetriever,
     llm=None,
     use_multi_query: bool = False,
     use_reranking: bool = True,
     rerank_top_k: int = 5,
+    provider: str = "gemini",
+    num_queries: int = 3,
+    max_parallel_subqueries: int = 3,
 ) -> BaseRetriever:
     """
     Builds an enhanced retriever with optional multi-query expansion and reranking.
@@ -66,6 +176,9 @@ def build_enhanced_retriever(
         use_multi_query: Whether to use multi-query retriever for query expansion
         use_reranking: Whether to apply reranking
         rerank_top_k: Number of top documents to return after reranking
+        provider: LLM provider, used to pick provider-specific expansion prompts
+        num_queries: Number of sub-queries the LLM is asked to generate
+        max_parallel_subqueries: Maximum sub-query retrievals running concurrently
     """
     retriever = base_retriever
     
@@ -76,15 +189,23 @@ def build_enhanced_retriever(
         elif not llm:
             logger.warning("Multi-query retriever requires an LLM, skipping multi-query expansion")
         else:
-            retriever = MultiQueryRetriever.from_llm(
+            # Expansion is a short standalone task: pair it with the minimal
+            # system prompt instead of the full agent prompt.
+            expansion_prompt = ChatPromptTemplate.from_messages([
+                ("system", get_prompt_for_provider("system_query_expansion", provider)),
+                ("human", get_prompt_for_provider("query_expansion", provider)),
+            ]).partial(num_queries=str(num_queries))
+            retriever = BoundedMultiQueryRetriever.from_llm(
                 retriever=retriever,
-                llm=llm
+                llm=llm,
+                prompt=expansion_prompt
             )
+            retriever.max_parallel = max_parallel_subqueries
             logger.info("Applied multi-query retriever for query expansion")
     
     # Apply reranking if requested
     if use_reranking:
-        reranker = Reranker()
+        reranker = get_reranker()
         retriever = RerankingRetriever(
             base_retriever=retriever,
             reranker=reranker,
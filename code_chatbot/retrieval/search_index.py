@@ -0,0 +1,138 @@
+"""Inverted token index over indexed files, used to narrow text searches before any file is read."""
+
+import functools
+import logging
+import os
+import re
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, FrozenSet, List, Optional, Sequence, Set
+
+logger = logging.getLogger(__name__)
+
+# Maximal runs of ASCII word characters; on bytes, \w never matches non-ASCII
+_TOKEN_RE = re.compile(rb"\w+")
+
+# Shorter query words match too many tokens to narrow anything down
+MIN_QUERY_WORD = 3
+
+
+def encode_vbyte(ids: Sequence[int]) -> bytes:
+    """Gap-encode ascending ids, 7 bits per byte; the high bit marks a number's last byte."""
+    out = bytearray()
+    prev = 0
+    for i in ids:
+        gap = i - prev
+        prev = i
+        while gap >= 0x80:
+            out.append(gap & 0x7F)
+            gap >>= 7
+        out.append(gap | 0x80)
+    return bytes(out)
+
+
+def decode_vbyte(data: bytes) -> List[int]:
+    """Inverse of encode_vbyte."""
+    ids = []
+    prev = gap = shift = 0
+    for b in data:
+        if b & 0x80:
+            prev += gap | ((b & 0x7F) << shift)
+            ids.append(prev)
+            gap = shift = 0
+        else:
+            gap |= b << shift
+            shift += 7
+    return ids
+
+
+def _file_tokens(
+    file_path: str, on_read: Optional[Callable[[str, bytes], None]] = None
+) -> Optional[FrozenSet[bytes]]:
+    """Distinct lowercased word tokens of a file, or None if it can't be read."""
+    try:
+        with open(file_path, "rb") as f:
+            data = f.read().lower()
+    except OSError:
+        return None
+    if on_read is not None:
+        on_read(file_path, data)
+    return frozenset(_TOKEN_RE.findall(data))
+
+
+class InvertedIndex:
+    """
+    Maps each lowercased word token to the ids of the files containing it.
+    Postings are stored vbyte-encoded (see encode_vbyte), about a byte per file
+    on typical codebases instead of a list of int objects.
+
+    Any case-insensitive occurrence of an ASCII word inside a file lies within one
+    of that file's tokens, so `candidates` never drops a file that could match:
+    it returns the files having, for every word of the query, a token containing it.
+
+    `on_read(file_path, lowered_bytes)` is called for each file read during the build,
+    so callers can derive other per-file data without reading the files again.
+    """
+
+    def __init__(
+        self,
+        files: Sequence[str],
+        max_workers: Optional[int] = None,
+        on_read: Optional[Callable[[str, bytes], None]] = None,
+    ):
+        self.files: List[str] = list(files)
+        postings: Dict[bytes, List[int]] = defaultdict(list)
+        # Unreadable files can't be ruled out, so they are always candidates
+        self._unindexed: Set[int] = set()
+
+        # Reads release the GIL, so threads overlap the I/O across files
+        with ThreadPoolExecutor(max_workers=max_workers or (os.cpu_count() or 1) * 2) as pool:
+            for file_id, tokens in enumerate(pool.map(functools.partial(_file_tokens, on_read=on_read), self.files)):
+                if tokens is None:
+                    self._unindexed.add(file_id)
+                    continue
+                for token in tokens:
+                    postings[token].append(file_id)
+
+        self._postings: Dict[bytes, bytes] = {token: encode_vbyte(ids) for token, ids in postings.items()}
+        logger.info(f"Search index built: {len(self.files)} files, {len(self._postings)} tokens")
+
+    def _files_with_word(self, word: bytes, exact: bool) -> Set[int]:
+        """Files having `word` as a whole token (exact) or inside any token (vocabulary scan)."""
+        ids = set(self._unindexed)
+        if exact:
+            encoded = self._postings.get(word)
+            if encoded is not None:
+                ids.update(decode_vbyte(encoded))
+            return ids
+        for token, encoded in self._postings.items():
+            if word in token:
+                ids.update(decode_vbyte(encoded))
+        return ids
+
+    def candidates(self, text: str) -> Optional[Set[str]]:
+        """
+        Files that may contain `text` (case-insensitive), or None when the text
+        has no ASCII word of at least MIN_QUERY_WORD characters to look up.
+        """
+        if not text.isascii():
+            return None
+        data = text.lower().encode()
+        # A word with a non-word character on both sides in the query can only
+        # match a whole token; one touching either end of the query may be part of a longer token
+        words: Dict[bytes, bool] = {}
+        for m in _TOKEN_RE.finditer(data):
+            if len(m.group()) >= MIN_QUERY_WORD:
+                exact = m.start() > 0 and m.end() < len(data)
+                words[m.group()] = words.get(m.group(), False) or exact
+        if not words:
+            return None
+
+        ids: Optional[Set[int]] = None
+        # Exact lookups first, then longest word first: it usually has the fewest matching tokens
+        for word in sorted(words, key=lambda w: (not words[w], -len(w))):
+            word_ids = self._files_with_word(word, words[word])
+            ids = word_ids if ids is None else ids & word_ids
+            if not ids:
+                break
+        return {self.files[i] for i in ids}
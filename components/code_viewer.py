@@ -1,6 +1,7 @@
 """
 Code Viewer Component - Displays file content with syntax highlighting.
 """
+import os
 import streamlit as st
 from pathlib import Path
 from pygments import highlight
@@ -8,44 +9,68 @@ from pygments.lexers import get_lexer_for_filename, TextLexer
 from pygments.formatters import HtmlFormatter
 from typing import Optional
 
+# Display names by extension
+_LANGUAGES = {
+    ".py": "Python",
+    ".js": "JavaScript",
+    ".ts": "TypeScript",
+    ".jsx": "React JSX",
+    ".tsx": "React TSX",
+    ".html": "HTML",
+    ".css": "CSS",
+    ".json": "JSON",
+    ".md": "Markdown",
+    ".yaml": "YAML",
+    ".yml": "YAML",
+    ".toml": "TOML",
+    ".sql": "SQL",
+    ".sh": "Shell",
+    ".bash": "Bash",
+    ".txt": "Plain Text",
+}
+
+# st.code language names by extension (without the dot)
+_LANG_MAP = {
+    "py": "python",
+    "js": "javascript",
+    "ts": "typescript",
+    "jsx": "javascript",
+    "tsx": "typescript",
+    "json": "json",
+    "md": "markdown",
+    "yaml": "yaml",
+    "yml": "yaml",
+    "sh": "bash",
+    "bash": "bash",
+    "sql": "sql",
+    "html": "html",
+    "css": "css",
+}
+
 
 def get_language_from_extension(filename: str) -> str:
     """Get language name from file extension for display."""
-    ext = Path(filename).suffix.lower()
-    
-    languages = {
-        ".py": "Python",
-        ".js": "JavaScript",
-        ".ts": "TypeScript",
-        ".jsx": "React JSX",
-        ".tsx": "React TSX",
-        ".html": "HTML",
-        ".css": "CSS",
-        ".json": "JSON",
-        ".md": "Markdown",
-        ".yaml": "YAML",
-        ".yml": "YAML",
-        ".toml": "TOML",
-        ".sql": "SQL",
-        ".sh": "Shell",
-        ".bash": "Bash",
-        ".txt": "Plain Text",
-    }
-    
-    return languages.get(ext, "Code")
+    return _LANGUAGES.get(Path(filename).suffix.lower(), "Code")
+
+
+@st.cache_data(show_spinner=False, max_entries=64, ttl=3600)
+def _read_file_cached(file_path: str, mtime: float) -> str:
+    # mtime is part of the cache key so edits on disk invalidate the entry
+    with open(file_path, 'rb') as f:
+        return f.read().decode('utf-8', 'ignore')
 
 
 def read_file_content(file_path: str) -> Optional[str]:
-    """Read and return file content."""
+    """Read and return file content (cached across reruns until the file changes)."""
     try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            return f.read()
+        return _read_file_cached(file_path, os.path.getmtime(file_path))
     except Exception as e:
         return f"Error reading file: {e}"
 
 
-def render_code_with_syntax_highlighting(content: str, filename: str):
-    """Render code with Pygments syntax highlighting."""
+@st.cache_data(show_spinner=False, max_entries=32, ttl=3600)
+def _highlight_html(content: str, filename: str) -> str:
+    """Pygments HTML for the given content; cached so reruns don't re-highlight."""
     try:
         lexer = get_lexer_for_filename(filename)
     except:
@@ -91,16 +116,26 @@ def render_code_with_syntax_highlighting(content: str, filename: str):
     </style>
     """
     
-    st.markdown(css + highlighted, unsafe_allow_html=True)
+    return css + highlighted
+
+
+def render_code_with_syntax_highlighting(content: str, filename: str):
+    """Render code with Pygments syntax highlighting."""
+    st.markdown(_highlight_html(content, filename), unsafe_allow_html=True)
 
 
-def render_code_viewer(file_path: Optional[str] = None):
+def render_code_viewer(file_path: Optional[str] = None, pygments: bool = False):
     """
     Render the code viewer panel.
     
     Args:
         file_path: Path to the file to display
+        pygments: Use the Pygments HTML renderer instead of the native st.code viewer
     """
+    if not pygments:
+        render_code_viewer_simple(file_path)
+        return
+
     if not file_path:
         # Show placeholder when no file is selected
         st.markdown("### 📝 Code Viewer")
@@ -152,25 +187,7 @@ def render_code_viewer_simple(file_path: Optional[str] = None):
         st.caption(f"{line_count} lines")
         
         # Use Streamlit's native code component
-        # Map extensions to language names for st.code
-        lang_map = {
-            "py": "python",
-            "js": "javascript",
-            "ts": "typescript",
-            "jsx": "javascript",
-            "tsx": "typescript",
-            "json": "json",
-            "md": "markdown",
-            "yaml": "yaml",
-            "yml": "yaml",
-            "sh": "bash",
-            "bash": "bash",
-            "sql": "sql",
-            "html": "html",
-            "css": "css",
-        }
-        
-        lang = lang_map.get(ext, "")
+        lang = _LANG_MAP.get(ext, "")
         st.code(content, language=lang, line_numbers=True)
     else:
         st.error("Could not read file contents")
@@ -1,11 +1,24 @@
 """
 File Explorer Component - VS Code style file tree.
 """
+import functools
 import streamlit as st
 import os
 from pathlib import Path
 from typing import Dict, List
 
+try:
+    from streamlit_tree_select import tree_select
+except ImportError:
+    tree_select = None
+
+_ICONS = {
+    ".py": "🐍", ".js": "📜", ".ts": "📘", ".jsx": "⚛️", ".tsx": "⚛️",
+    ".html": "🌐", ".css": "🎨", ".json": "📋", ".md": "📝",
+    ".yaml": "⚙️", ".yml": "⚙️", ".toml": "⚙️", ".sql": "🗃️",
+    ".env": "🔐", ".gitignore": "🚫", ".txt": "📄",
+}
+
 
 def build_file_tree(file_paths: List[str], base_path: str = "") -> Dict:
     """Build a nested dictionary representing the file tree."""
@@ -27,25 +40,44 @@ def build_file_tree(file_paths: List[str], base_path: str = "") -> Dict:
             if i == len(parts) - 1:
                 current[part] = {"_type": "file", "_path": file_path}
             else:
-                if part not in current:
-                    current[part] = {"_type": "dir", "_children": {}}
-                current = current.get(part, {}).get("_children", current.get(part, {}))
-                if "_children" not in current:
-                    current = current
+                node = current.setdefault(part, {"_type": "dir", "_children": {}})
+                current = node.setdefault("_children", {})
     
     return tree
 
 
+@st.cache_data(show_spinner=False)
+def _build_tree_cached(files: tuple, base_path: str) -> Dict:
+    """build_file_tree memoized on the (hashable) file list, so reruns skip the rebuild."""
+    return build_file_tree(list(files), base_path)
+
+
+def build_tree_nodes(tree: Dict, prefix: str = "") -> List[Dict]:
+    """Convert the nested tree into tree_select nodes (directories first, then files)."""
+    items = [(k, v) for k, v in tree.items() if not k.startswith("_")]
+    nodes = []
+    for name, node in sorted(items, key=lambda x: (x[1].get("_type") == "file", x[0].lower())):
+        if node.get("_type") == "file":
+            nodes.append({"label": f"{get_file_icon(name)} {name}", "value": node.get("_path", "")})
+        else:
+            dir_path = f"{prefix}{name}/"
+            nodes.append({
+                "label": f"📁 {name}",
+                "value": f"dir::{dir_path}",
+                "children": build_tree_nodes(node.get("_children", {}), dir_path),
+            })
+    return nodes
+
+
+@st.cache_data(show_spinner=False)
+def _tree_nodes_cached(files: tuple, base_path: str) -> List[Dict]:
+    return build_tree_nodes(_build_tree_cached(files, base_path))
+
+
+@functools.lru_cache(maxsize=256)
 def get_file_icon(filename: str) -> str:
     """Get icon for file based on extension."""
-    ext = Path(filename).suffix.lower()
-    icons = {
-        ".py": "🐍", ".js": "📜", ".ts": "📘", ".jsx": "⚛️", ".tsx": "⚛️",
-        ".html": "🌐", ".css": "🎨", ".json": "📋", ".md": "📝",
-        ".yaml": "⚙️", ".yml": "⚙️", ".toml": "⚙️", ".sql": "🗃️",
-        ".env": "🔐", ".gitignore": "🚫", ".txt": "📄",
-    }
-    return icons.get(ext, "📄")
+    return _ICONS.get(Path(filename).suffix.lower(), "📄")
 
 
 def render_file_tree(indexed_files: List[str], base_path: str = ""):
@@ -60,8 +92,12 @@ def render_file_tree(indexed_files: List[str], base_path: str = ""):
     
     st.markdown(f"**📁 Files** ({len(indexed_files)})")
     
+    if tree_select is not None:
+        render_tree_component(indexed_files, base_path)
+        return
+
     # Build and render tree
-    tree = build_file_tree(indexed_files, base_path)
+    tree = _build_tree_cached(tuple(indexed_files), base_path)
     
     # Initialize expanded state
     if "tree_expanded" not in st.session_state:
@@ -71,6 +107,43 @@ def render_file_tree(indexed_files: List[str], base_path: str = ""):
     render_tree_items(tree, 0)
 
 
+def render_tree_component(indexed_files: List[str], base_path: str = ""):
+    """
+    Render the whole tree as one streamlit-tree-select widget.
+    Expand/collapse happens in the browser; only checking a file reruns the script.
+    """
+    nodes = _tree_nodes_cached(tuple(indexed_files), base_path)
+    selected = st.session_state.get("selected_file")
+    result = tree_select(
+        nodes,
+        checked=[selected] if selected else [],
+        expanded=st.session_state.get("tree_expanded_nodes", []),
+        only_leaf_checkboxes=True,
+        no_cascade=True,
+        key="filetree",
+    )
+    if not result:
+        return
+
+    st.session_state.tree_expanded_nodes = result.get("expanded", [])
+    # The newly checked leaf becomes the selected file
+    newly_checked = [v for v in result.get("checked", []) if v != selected and not v.startswith("dir::")]
+    if newly_checked:
+        st.session_state.selected_file = newly_checked[-1]
+
+
+def _select_file(file_path: str):
+    st.session_state.selected_file = file_path
+
+
+def _toggle_dir(dir_key: str):
+    expanded = st.session_state.tree_expanded
+    if dir_key in expanded:
+        expanded.discard(dir_key)
+    else:
+        expanded.add(dir_key)
+
+
 def render_tree_items(tree: Dict, depth: int):
     """Render tree items with proper indentation."""
     
@@ -90,10 +163,9 @@ def render_tree_items(tree: Dict, depth: int):
             
             # Compact button
             btn_label = f"{indent}├─ {icon} {name}"
-            if st.button(btn_label, key=f"tree_{file_path}", use_container_width=True,
-                        type="primary" if is_selected else "secondary"):
-                st.session_state.selected_file = file_path
-                st.rerun()
+            st.button(btn_label, key=f"tree_{file_path}", use_container_width=True,
+                      type="primary" if is_selected else "secondary",
+                      on_click=_select_file, args=(file_path,))
         else:
             # Directory item
             dir_key = f"dir_{depth}_{name}"
@@ -101,12 +173,8 @@ def render_tree_items(tree: Dict, depth: int):
             arrow = "▼" if is_expanded else "▶"
             
             btn_label = f"{indent}{arrow} 📁 {name}"
-            if st.button(btn_label, key=dir_key, use_container_width=True, type="secondary"):
-                if is_expanded:
-                    st.session_state.tree_expanded.discard(dir_key)
-                else:
-                    st.session_state.tree_expanded.add(dir_key)
-                st.rerun()
+            st.button(btn_label, key=dir_key, use_container_width=True, type="secondary",
+                      on_click=_toggle_dir, args=(dir_key,))
             
             # Render children if expanded
             if is_expanded:
@@ -6,13 +6,24 @@ Provides different interaction modes: Chat, Search, Refactor, Generate
 
 import streamlit as st
 from typing import Optional, Dict, Any
+import itertools
 import os
+import re
 from pathlib import Path
 
+try:
+    from code_chatbot.mcp.mcp_client import MCPClient
+    _MCP_AVAILABLE = True
+except ImportError:
+    MCPClient = None
+    _MCP_AVAILABLE = False
 
+
+@st.cache_data(ttl=60, show_spinner=False)
 def get_workspace_root() -> str:
     """
     Get the workspace root directory for the indexed codebase.
+    Cached for a minute so reruns don't rescan the data directory.
     
     Returns:
         Path to the extracted/processed codebase
@@ -29,6 +40,34 @@ def get_workspace_root() -> str:
     return "data"
 
 
+# Built-in refactorings offered under "Common Patterns"; compiled once, MULTILINE so $ ends each line
+_COMMON_PATTERNS = {
+    "print() → logging": {
+        "search": re.compile(r"print\((.*)\)", re.MULTILINE),
+        "replace": r"logger.info(\1)",
+        "description": "Replace print statements with logging"
+    },
+    "assertEqual → assert ==": {
+        "search": re.compile(r"assertEqual\(([^,]+),\s*([^)]+)\)", re.MULTILINE),
+        "replace": r"assert \1 == \2",
+        "description": "Convert unittest to pytest assertions"
+    },
+    "Remove trailing whitespace": {
+        "search": re.compile(r"[ \t]+$", re.MULTILINE),
+        "replace": "",
+        "description": "Clean up trailing whitespace"
+    }
+}
+
+
+@st.cache_resource(show_spinner=False)
+def _get_mcp_client(workspace: str):
+    """One MCPClient per workspace, reused across reruns and modes."""
+    if not _MCP_AVAILABLE:
+        raise ImportError("MCP client is unavailable; install the 'mcp' requirements")
+    return MCPClient(workspace_root=workspace)
+
+
 def render_mode_selector() -> str:
     """
     Render mode selector and return selected mode.
@@ -135,18 +174,17 @@ def render_search_mode():
         
         with st.spinner("Searching codebase..."):
             try:
-                from code_chatbot.mcp.mcp_client import MCPClient
-                
-                client = MCPClient(workspace_root=workspace)
-                results = client.search_code(
+                client = _get_mcp_client(workspace)
+                # Stream the search and stop scanning once one result past the limit is found
+                results = list(itertools.islice(client.iter_search_code(
                     pattern=pattern,
                     file_pattern=file_pattern,
                     context_lines=context_lines,
                     is_regex=is_regex
-                )
+                ), 21))
                 
                 if results:
-                    st.success(f"✅ Found {len(results)} matches")
+                    st.success(f"✅ Found {'20+' if len(results) > 20 else len(results)} matches")
                     
                     # Display results
                     for i, result in enumerate(results[:20], 1):  # Limit to 20 results
@@ -164,7 +202,7 @@ def render_search_mode():
                                 st.code("\n".join(result.context_after), language="python")
                     
                     if len(results) > 20:
-                        st.info(f"Showing first 20 of {len(results)} results")
+                        st.info("Showing the first 20 results")
                 else:
                     st.info("No matches found. Try a different pattern.")
                     
@@ -219,14 +257,18 @@ def render_refactor_mode():
             if not search_pattern or not replace_pattern:
                 st.warning("Please enter both search and replace patterns")
                 return
+            try:
+                # Reject typos here rather than after a round-trip to the MCP server
+                search_regex = re.compile(search_pattern)
+            except re.error as e:
+                st.error(f"Invalid regex: {e}")
+                return
             
             with st.spinner("Processing refactoring..."):
                 try:
-                    from code_chatbot.mcp.mcp_client import MCPClient
-                    
-                    client = MCPClient(workspace_root=workspace)
+                    client = _get_mcp_client(workspace)
                     result = client.refactor_code(
-                        search_pattern=search_pattern,
+                        search_pattern=search_regex,
                         replace_pattern=replace_pattern,
                         file_pattern=file_pattern,
                         dry_run=dry_run
@@ -261,35 +303,17 @@ def render_refactor_mode():
         # Common patterns
         st.markdown("#### Common Refactoring Patterns")
         
-        common_patterns = {
-            "print() → logging": {
-                "search": r"print\((.*)\)",
-                "replace": r"logger.info(\1)",
-                "description": "Replace print statements with logging"
-            },
-            "assertEqual → assert ==": {
-                "search": r"assertEqual\(([^,]+),\s*([^)]+)\)",
-                "replace": r"assert \1 == \2",
-                "description": "Convert unittest to pytest assertions"
-            },
-            "Remove trailing whitespace": {
-                "search": r"[ \t]+$",
-                "replace": "",
-                "description": "Clean up trailing whitespace"
-            }
-        }
-        
         pattern_choice = st.selectbox(
             "Select Pattern",
-            list(common_patterns.keys())
+            list(_COMMON_PATTERNS.keys())
         )
         
-        selected = common_patterns[pattern_choice]
+        selected = _COMMON_PATTERNS[pattern_choice]
         st.info(selected["description"])
         
         col1, col2 = st.columns(2)
         with col1:
-            st.code(f"Search: {selected['search']}", language="regex")
+            st.code(f"Search: {selected['search'].pattern}", language="regex")
         with col2:
             st.code(f"Replace: {selected['replace']}", language="regex")
         
@@ -298,9 +322,7 @@ def render_refactor_mode():
         if st.button("Apply Refactoring", type="primary", use_container_width=True):
             with st.spinner("Processing..."):
                 try:
-                    from code_chatbot.mcp.mcp_client import MCPClient
-                    
-                    client = MCPClient(workspace_root=workspace)
+                    client = _get_mcp_client(workspace)
                     result = client.refactor_code(
                         search_pattern=selected["search"],
                         replace_pattern=selected["replace"],
@@ -365,129 +387,16 @@ def render_generate_mode(chat_engine):
         
         with st.spinner("🤖 Generating feature... (this may take 30-60 seconds)"):
             try:
-                # Build comprehensive AI Engineer prompt
-                prompt = f"""You are a **Senior AI/Software Engineer** with 15+ years of experience building production systems at top tech companies. Your expertise spans system design, security, scalability, and clean code architecture.
-
-## 🎯 MISSION
-Analyze the existing codebase and generate a **production-ready, enterprise-grade** implementation for the requested feature.
-
----
-
-## 📋 FEATURE REQUEST
-{feature_desc}
-
----
-
-## ⚙️ CONFIGURATION
-| Setting | Value |
-|---------|-------|
-| **Framework** | {framework} |
-| **Include Tests** | {include_tests} |
-| **Include Documentation** | {include_docs} |
-| **Include Examples** | {include_examples} |
-
----
+                from code_chatbot.core.prompts import FEATURE_GENERATION_PROMPT
 
-## 🧠 YOUR APPROACH (Follow This Process)
-
-### Phase 1: Architecture Analysis
-Before writing code, analyze the existing codebase to understand:
-- **Project structure** and conventions
-- **Naming patterns** (snake_case, camelCase, etc.)
-- **Import style** and module organization
-- **Error handling** patterns
-- **Logging** approach
-- **Configuration** management style
-
-### Phase 2: Design the Solution
-- Choose appropriate **design patterns** (Factory, Repository, Service Layer, etc.)
-- Plan **database schema** changes if needed
-- Define **API contracts** (request/response schemas)
-- Consider **edge cases** and error scenarios
-- Plan for **scalability** and performance
-
-### Phase 3: Implementation
-Generate code that includes:
-
-1. **🏗️ Architecture Overview**
-   - High-level system diagram (ASCII or Mermaid)
-   - Component relationships and data flow
-   
-2. **📁 File Structure**
-   ```
-   feature_name/
-   ├── __init__.py
-   ├── models.py       # Data models/schemas
-   ├── service.py      # Business logic
-   ├── routes.py       # API endpoints (if applicable)
-   ├── utils.py        # Helper functions
-   └── tests/
-       ├── test_service.py
-       └── test_routes.py
-   ```
-
-3. **💻 Complete Code** for each file with:
-   - **Type hints** on all functions
-   - **Docstrings** with Args, Returns, Raises
-   - **Input validation** and sanitization
-   - **Error handling** with custom exceptions
-   - **Logging** at appropriate levels
-   - **Security** considerations (auth, injection prevention, etc.)
-
-4. **🧪 Test Suite** (if enabled):
-   - Unit tests with pytest
-   - Edge case coverage
-   - Mock external dependencies
-   - Minimum 80% code coverage target
-
-5. **📖 Documentation** (if enabled):
-   - API documentation with examples
-   - Usage guide
-   - Configuration options
-
-6. **🚀 Integration Guide**:
-   - Step-by-step setup instructions
-   - Environment variables needed
-   - Dependencies to install
-   - How to integrate with existing code
-
----
-
-## 📝 CODE FILE FORMAT
-For each file, use this exact format:
-
-### `path/to/filename.py`
-```python
-\"\"\"
-Module docstring explaining purpose.
-\"\"\"
-# imports here
-
-# code here with full implementation
-```
-
----
-
-## ✅ QUALITY CHECKLIST
-Ensure your code:
-- [ ] Follows existing codebase conventions
-- [ ] Has no hardcoded values (use config/env vars)
-- [ ] Handles all error cases gracefully
-- [ ] Is thread-safe if applicable
-- [ ] Has no security vulnerabilities
-- [ ] Is optimized for performance
-- [ ] Is maintainable and readable
-
----
-
-## 🎨 STYLE REQUIREMENTS
-- Clean, readable code over clever code
-- Self-documenting function/variable names
-- Comments for complex logic only
-- Consistent formatting with project style
-- DRY (Don't Repeat Yourself) principle
-
-Now generate the complete, production-ready implementation:"""
+                # Build comprehensive AI Engineer prompt
+                prompt = FEATURE_GENERATION_PROMPT.format(
+                    feature_desc=feature_desc,
+                    framework=framework,
+                    include_tests=include_tests,
+                    include_docs=include_docs,
+                    include_examples=include_examples,
+                )
                 
                 # Use chat engine
                 answer, sources = chat_engine.chat(prompt)
@@ -1,8 +1,40 @@
 import streamlit as st
+import functools
+import base64
+import hashlib
+import html
+import itertools
+import json
+import logging
+import mmap
 import os
 import re
-from pathlib import Path
-import logging
+import shutil
+import subprocess
+import threading
+import time
+import weakref
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import OrderedDict
+from typing import Optional
+from code_chatbot.retrieval.search_index import InvertedIndex
+
+logger = logging.getLogger(__name__)
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+# Suggestion buttons shown on an empty chat: (label, widget key, prompt)
+_SUGGESTIONS = (
+    ("🔍 Explain structure", "btn_explain", "Explain the project structure and main components"),
+    ("⚡ Generate utility", "btn_util", "Generate a new utility function for this project"),
+    ("📝 List functions", "btn_list", "List all the main functions and their purpose"),
+    ("🔧 Improvements", "btn_imp", "What improvements would you suggest for this code?"),
+)
+
 
 def render_chat_panel(chat_engine):
     """
@@ -20,20 +52,14 @@ def render_chat_panel(chat_engine):
         st.markdown("#### 💡 Try asking:")
         
         col1, col2 = st.columns(2)
-        with col1:
-            if st.button("🔍 Explain structure", use_container_width=True, key="btn_explain"):
-                st.session_state.pending_prompt = "Explain the project structure and main components"
-                st.rerun()
-            if st.button("⚡ Generate utility", use_container_width=True, key="btn_util"):
-                st.session_state.pending_prompt = "Generate a new utility function for this project"
-                st.rerun()
-        with col2:
-            if st.button("📝 List functions", use_container_width=True, key="btn_list"):
-                st.session_state.pending_prompt = "List all the main functions and their purpose"
-                st.rerun()
-            if st.button("🔧 Improvements", use_container_width=True, key="btn_imp"):
-                st.session_state.pending_prompt = "What improvements would you suggest for this code?"
-                st.rerun()
+        for i, (label, key, suggestion) in enumerate(_SUGGESTIONS):
+            with col1 if i < 2 else col2:
+                if st.button(label, use_container_width=True, key=key):
+                    st.session_state.pending_prompt = suggestion
+                    st.rerun()
+        if st.button("⚡ Run all suggestions", use_container_width=True, key="btn_run_all"):
+            st.session_state.pending_batch = True
+            st.rerun()
     
     # Message Container
     # We use a container with fixed height to allow scrolling independent of the editor
@@ -43,18 +69,25 @@ def render_chat_panel(chat_engine):
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
             # Render Sources if available
-            if "sources" in message and message["sources"]:
-                _render_sources(message["sources"])
+            paths = message.get("unique_sources")
+            if paths is None and message.get("sources"):
+                paths = _unique_source_paths(message["sources"])
+            if paths:
+                _render_sources(paths)
             
             st.markdown(message["content"])
 
+    if st.session_state.pop("pending_batch", False):
+        _run_suggestion_batch(chat_engine)
+
     # Handle pending prompt
     prompt = st.session_state.pop("pending_prompt", None)
 
     # Chat input
     # key needs to be unique if we have multiple inputs, but usually only one chat input active
     if user_input := st.chat_input("Ask about your code...", key="chat_panel_input"):
-        prompt = user_input
+        # Stripped so a repeated question hits the LLM cache (when enabled) regardless of stray whitespace
+        prompt = user_input.strip()
 
     if prompt:
         # Add user message
@@ -64,53 +97,432 @@ def render_chat_panel(chat_engine):
         
         # Generate response
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                try:
-                    # Blocking call
-                    answer_payload = chat_engine.chat(prompt)
-                    
+            try:
+                if _can_stream(chat_engine):
+                    # Linear RAG: show tokens as they arrive instead of after the full answer
+                    tokens, sources = chat_engine.stream_chat(prompt)
+                    unique_sources = _unique_source_paths(sources)
+                    if unique_sources:
+                        _render_sources(unique_sources)
+                    placeholder = st.empty()
+                    with placeholder:
+                        raw = st.write_stream(tokens)
+                    # Same cleanup the blocking path applies; redraw only if it changed anything
+                    response = chat_engine.clean_response(raw if isinstance(raw, str) else "".join(map(str, raw)))
+                    if response != raw:
+                        placeholder.markdown(response)
+                else:
+                    with st.spinner("Thinking..."):
+                        # Blocking call
+                        answer_payload = chat_engine.chat(prompt)
+
                     if isinstance(answer_payload, tuple):
                         response, sources = answer_payload
                     else:
                         response = answer_payload
                         sources = []
-                    
-                    if sources:
-                        _render_sources(sources)
-                    
+
+                    unique_sources = _unique_source_paths(sources)
+                    if unique_sources:
+                        _render_sources(unique_sources)
+
                     st.markdown(response)
-                    
-                    st.session_state.messages.append({
-                        "role": "assistant", 
-                        "content": response,
-                        "sources": sources
-                    })
-                    
-                except Exception as e:
-                    error_msg = f"Error: {str(e)}"
-                    st.error(error_msg)
-                    st.session_state.messages.append({"role": "assistant", "content": error_msg})
-
-def _render_sources(sources):
-    unique_sources = {}
-    for s in sources:
-        if isinstance(s, dict):
-            fp = s.get('file_path', 'Unknown')
-        else:
-            fp = str(s)
-        if fp not in unique_sources:
-            unique_sources[fp] = s
-
-    chips_html = '<div style="display: flex; gap: 8px; flex-wrap: wrap; margin-bottom: 10px;">'
-    for fp in unique_sources:
-        basename = os.path.basename(fp) if "/" in fp else fp
-        chips_html += f"""
-        <div class="source-chip">
-            📄 {basename}
-        </div>
-        """
-    chips_html += '</div>'
-    st.markdown(chips_html, unsafe_allow_html=True)
+
+                st.session_state.messages.append({
+                    "role": "assistant", 
+                    "content": response,
+                    "sources": sources,
+                    # Deduped once here so replaying history doesn't redo it every rerun
+                    "unique_sources": unique_sources
+                })
+
+            except Exception as e:
+                error_msg = f"Error: {str(e)}"
+                st.error(error_msg)
+                st.session_state.messages.append({"role": "assistant", "content": error_msg})
+
+
+def _run_suggestion_batch(chat_engine):
+    """Ask every suggestion at once; batch_chat overlaps the calls so this takes about as long as one."""
+    prompts = [suggestion for _, _, suggestion in _SUGGESTIONS]
+    try:
+        with st.spinner(f"Running {len(prompts)} suggestions..."):
+            if hasattr(chat_engine, "batch_chat"):
+                results = chat_engine.batch_chat(prompts)
+            else:
+                results = [chat_engine.chat(p) for p in prompts]
+    except Exception as e:
+        error_msg = f"Error: {str(e)}"
+        st.error(error_msg)
+        st.session_state.messages.append({"role": "assistant", "content": error_msg})
+        return
+
+    for prompt, (response, sources) in zip(prompts, results):
+        st.session_state.messages.append({"role": "user", "content": prompt})
+        with st.chat_message("user"):
+            st.markdown(prompt)
+
+        unique_sources = _unique_source_paths(sources)
+        with st.chat_message("assistant"):
+            if unique_sources:
+                _render_sources(unique_sources)
+            st.markdown(response)
+        st.session_state.messages.append({
+            "role": "assistant",
+            "content": response,
+            "sources": sources,
+            "unique_sources": unique_sources
+        })
+
+
+def _can_stream(chat_engine) -> bool:
+    """Linear RAG engines expose token streaming; the agent graph only returns whole answers."""
+    if not hasattr(chat_engine, "stream_chat") or not hasattr(st, "write_stream"):
+        return False
+    return not (getattr(chat_engine, "use_agent", False) and getattr(chat_engine, "agent_executor", None))
+
+
+def _source_path(s) -> str:
+    return s.get('file_path', 'Unknown') if isinstance(s, dict) else str(s)
+
+
+def _unique_source_paths(sources) -> tuple:
+    """Source file paths in first-seen order, without duplicates."""
+    return tuple(dict.fromkeys(_source_path(s) for s in sources))
+
+
+_SOURCE_CHIP = '<div class="source-chip">📄 {}</div>'
+_SOURCE_CHIPS_ROW = '<div style="display: flex; gap: 8px; flex-wrap: wrap; margin-bottom: 10px;">{}</div>'
+
+
+@functools.lru_cache(maxsize=256)
+def _chips_html(paths: tuple) -> str:
+    chips = "".join(
+        _SOURCE_CHIP.format(os.path.basename(fp) if "/" in fp else fp) for fp in paths
+    )
+    return _SOURCE_CHIPS_ROW.format(chips)
+
+
+def _render_sources(paths: tuple):
+    st.markdown(_chips_html(paths), unsafe_allow_html=True)
+
+
+@st.cache_resource(show_spinner=False, max_entries=256)
+def _get_pattern(query: str, ignore_case: bool = True, ascii_only: bool = False) -> re.Pattern:
+    """
+    Compiled search regex, reused across reruns for the same query.
+    ascii_only is for escaped ASCII literals: ASCII case folding is cheaper than the
+    Unicode tables and matches what the byte-level literal and trigram filters assume.
+    User regexes keep Unicode semantics for \\w, \\b and friends.
+    """
+    # MULTILINE keeps ^/$ anchored per line now that whole files are scanned at once
+    flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0) | (re.ASCII if ascii_only else 0)
+    return re.compile(query, flags)
+
+
+def _scan_text(text, search):
+    """
+    Yield (line_num, line, match) for each line of text (str or bytes) containing a match.
+    `search(pos)` returns (start, matched_text) of the next hit at or after pos, or None.
+    The search walks the whole buffer in C; line numbers are counted only
+    between hits, so there is no per-line Python loop.
+    """
+    nl = b"\n" if isinstance(text, bytes) else "\n"
+    line_num, counted_to, pos = 1, 0, 0
+    while True:
+        hit = search(pos)
+        if hit is None:
+            return
+        start, match = hit
+        line_num += text.count(nl, counted_to, start)
+        counted_to = start
+        line_start = text.rfind(nl, 0, start) + 1
+        line_end = text.find(nl, start)
+        if line_end == -1:
+            line_end = len(text)
+        yield line_num, text[line_start:line_end], match
+        if line_end >= len(text):
+            return
+        # One result per line, like the old line-by-line scan
+        pos = line_end + 1
+
+
+def _regex_search(text: str, pattern: re.Pattern):
+    """
+    Regex search over the whole text whose hits stay within one line, like the old
+    readlines() scan: a match running past its line (e.g. through \\s or [^)]*) is
+    retried on that line alone, trailing newline included as readlines() kept it.
+    """
+    def search(pos):
+        while True:
+            m = pattern.search(text, pos)
+            if m is None:
+                return None
+            line_end = text.find("\n", m.start())
+            stop = len(text) if line_end == -1 else line_end + 1
+            if m.end() > stop:
+                m = pattern.search(text, text.rfind("\n", 0, m.start()) + 1, stop)
+            if m is not None:
+                return m.start(), m.group()
+            if stop >= len(text):
+                return None
+            pos = stop
+    return search
+
+
+def _literal_search(text, needle):
+    """
+    Case-insensitive substring search with str.find / bytes.find (same type as text);
+    None if lowercasing shifts offsets.
+    """
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        return None
+
+    def search(pos):
+        start = lowered.find(needle, pos)
+        return (start, text[start:start + len(needle)]) if start != -1 else None
+    return search
+
+
+# File reads release the GIL, so threads overlap I/O across files
+SEARCH_WORKERS = (os.cpu_count() or 1) * 2
+
+# Files above this size are checked through a read-only mmap before being read
+MMAP_SCAN_THRESHOLD = 256 * 1024
+
+# Files per page of search results
+SEARCH_PAGE_SIZE = 20
+
+# Scanning stops at this many matches per file and in total; the UI shows 5 lines per file
+MAX_FILE_MATCHES = 10
+MAX_TOTAL_RESULTS = 1000
+
+# ripgrep, when installed, scans the candidate files natively; the Python scan is the fallback
+RG_PATH = shutil.which("rg")
+
+# Files per rg invocation, keeping the command line well under OS limits
+RG_BATCH_SIZE = 500
+
+# Per-file trigram filter: 2**16 bits (8 KB) per file, hashed from lowercased byte trigrams
+TRIGRAM_BITS = 1 << 16
+
+# Memory budgets for the per-file trigram bitmaps and the small-file read cache
+TRIGRAM_CACHE_BYTES = 64 * 1024 * 1024
+READ_CACHE_BYTES = 64 * 1024 * 1024
+
+
+class _ByteLRU:
+    """Thread-safe LRU bounded by the total size in bytes of its values, not their count."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value, nbytes: int):
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._size -= old[1]
+            self._items[key] = (value, nbytes)
+            self._size += nbytes
+            while self._size > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self._size -= evicted
+
+
+_TRIGRAM_CACHE = _ByteLRU(TRIGRAM_CACHE_BYTES)
+_READ_CACHE = _ByteLRU(READ_CACHE_BYTES)
+
+
+def _trigram_hashes(data: bytes) -> np.ndarray:
+    arr = np.frombuffer(data, dtype=np.uint8).astype(np.uint32)
+    codes = (arr[:-2] << 16) | (arr[1:-1] << 8) | arr[2:]
+    # Multiplicative hash; the top 16 bits of the 32-bit product index the bitmap
+    return (codes * np.uint32(2654435761)) >> np.uint32(16)
+
+
+def _store_trigram_bitmap(file_path: str, mtime_ns: Optional[int], lowered: bytes):
+    """Cache the packed trigram bitmap of a file's lowercased bytes, read by the index build."""
+    if mtime_ns is None:
+        return
+    bits = np.zeros(TRIGRAM_BITS, dtype=bool)
+    if len(lowered) >= 3:
+        bits[_trigram_hashes(lowered)] = True
+    bitmap = np.packbits(bits)
+    _TRIGRAM_CACHE.put((file_path, mtime_ns), bitmap, bitmap.nbytes)
+
+
+def _may_contain(file_path: str, query_hashes: np.ndarray) -> bool:
+    """
+    False only if the file certainly lacks one of the query's trigrams (no false negatives).
+    Files without a cached bitmap (evicted, or changed since the index build) are kept,
+    so the filter never reads a file the scan would read again.
+    """
+    try:
+        cached = _TRIGRAM_CACHE.get((file_path, os.stat(file_path).st_mtime_ns))
+    except OSError:
+        return True
+    if cached is None:
+        return True
+    bitmap = cached[0]
+    return bool(np.all(bitmap[query_hashes >> 3] & (0x80 >> (query_hashes & 7)).astype(np.uint8)))
+
+
+def _files_by_ext(indexed_files) -> dict:
+    """indexed_files bucketed by lowercased extension, built once per indexed file list."""
+    cached = st.session_state.get("files_by_ext")
+    if cached is not None and cached[0] is indexed_files:
+        return cached[1]
+    by_ext = {}
+    for f in indexed_files:
+        # splitext avoids building a Path object per file
+        by_ext.setdefault(os.path.splitext(f)[1].lower(), []).append(f)
+    st.session_state.files_by_ext = (indexed_files, by_ext)
+    return by_ext
+
+
+_INDEX_LOCK = threading.Lock()
+
+
+@functools.lru_cache(maxsize=2)
+def _build_search_index(files: tuple, mtimes: tuple) -> InvertedIndex:
+    # The trigram bitmaps are filled from the same read as the tokens
+    mtime_of = dict(zip(files, mtimes))
+    return InvertedIndex(files, on_read=lambda path, data: _store_trigram_bitmap(path, mtime_of[path], data))
+
+
+def _search_index(files: tuple, mtimes: tuple) -> InvertedIndex:
+    """
+    Token index of the indexed files; mtimes in the key rebuild it when any file changes.
+    Built from search threads, one at a time, so a search started mid-build reuses it.
+    """
+    with _INDEX_LOCK:
+        return _build_search_index(files, mtimes)
+
+
+def _mtime_ns(file_path: str) -> Optional[int]:
+    try:
+        return os.stat(file_path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _required_literal(pattern: re.Pattern) -> Optional[str]:
+    """
+    Longest run of literal characters every match of the regex must contain
+    (top-level sequence only; groups, classes and alternation end a run).
+    """
+    try:
+        parsed = sre_parse.parse(pattern.pattern, pattern.flags)
+    except Exception:
+        return None
+    best, run = "", []
+    for op, av in list(parsed) + [(None, None)]:
+        if op is sre_parse.LITERAL:
+            run.append(chr(av))
+            continue
+        if len(run) > len(best):
+            best = "".join(run)
+        run = []
+    return best.lower() if len(best) >= 3 else None
+
+
+def _mapped_contains(file_path: str, needle: str) -> bool:
+    """
+    For large files, test an ASCII needle against the mapped bytes (case-insensitive).
+    Files with no hit are then skipped without being copied into memory or decoded.
+    """
+    with open(file_path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # mm.find is a plain memory scan; the case-insensitive regex only runs when it misses
+            return mm.find(needle.encode()) != -1 or _bytes_pattern(needle).search(mm) is not None
+
+
+@functools.lru_cache(maxsize=64)
+def _bytes_pattern(needle: str) -> re.Pattern:
+    return re.compile(re.escape(needle.encode()), re.IGNORECASE)
+
+
+def _read_cached(file_path: str, mtime_ns: int) -> bytes:
+    """Contents of a small file; mtime_ns in the key means an edited file is read again."""
+    key = (file_path, mtime_ns)
+    cached = _READ_CACHE.get(key)
+    if cached is not None:
+        return cached[0]
+    with open(file_path, "rb") as f:
+        data = f.read()
+    _READ_CACHE.put(key, data, len(data))
+    return data
+
+
+def _read_file(file_path: str, literal: Optional[str]) -> Optional[bytes]:
+    """
+    File bytes for a scan, or None if the file can't contain `literal`.
+    Small files come from the read cache, so repeat searches skip open/read;
+    large files are checked through mmap first and never cached.
+    """
+    stat = os.stat(file_path)
+    if stat.st_size <= MMAP_SCAN_THRESHOLD:
+        return _read_cached(file_path, stat.st_mtime_ns)
+    if literal and literal.isascii() and not _mapped_contains(file_path, literal):
+        return None
+    with open(file_path, "rb") as f:
+        return f.read()
+
+
+def _decode(data: bytes) -> str:
+    """Decode file bytes like open(..., "r", errors="ignore") would, universal newlines included."""
+    text = data.decode("utf-8", "ignore")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+def _scan_file(
+    file_path: str, pattern: re.Pattern, needle: Optional[str] = None, literal: Optional[str] = None
+) -> list:
+    """
+    Search one file; a lowercase `needle` takes the literal fast path, `pattern` is the fallback.
+    `literal` is a lowercase string every match contains, used to skip large files early.
+    """
+    try:
+        data = _read_file(file_path, literal)
+    except OSError:
+        return []
+    if data is None:
+        return []
+    if needle and needle.isascii():
+        # ASCII literal: search the raw bytes and decode only the matching lines
+        hits = itertools.islice(_scan_text(data, _literal_search(data, needle.encode())), MAX_FILE_MATCHES)
+        return [
+            {"file": file_path, "line_num": line_num,
+             "content": line.decode("utf-8", "ignore"), "match": match.decode("utf-8", "ignore")}
+            for line_num, line, match in hits
+        ]
+    if literal and literal.isascii() and data.lower().find(literal.encode()) == -1:
+        # No required literal in the file, so the regex cannot match: skip decoding and the regex pass
+        return []
+    text = _decode(data)
+    search = _literal_search(text, needle) if needle else None
+    if search is None:
+        search = _regex_search(text, pattern)
+    return [
+        # content is the raw line slice; it is only stripped for the few lines displayed
+        {"file": file_path, "line_num": line_num, "content": line, "match": match}
+        for line_num, line, match in itertools.islice(_scan_text(text, search), MAX_FILE_MATCHES)
+    ]
 
 
 def render_search_panel(indexed_files):
@@ -130,66 +542,335 @@ def render_search_panel(indexed_files):
     )
     
     if query and st.button("Go", key="search_go", type="primary"):
-        results = []
         try:
-            pattern = re.compile(query, re.IGNORECASE) if use_regex else None
+            # Plain-text search is a case-insensitive match of the escaped query
+            if use_regex:
+                pattern = _get_pattern(query)
+            else:
+                pattern = _get_pattern(re.escape(query), ascii_only=query.isascii())
+            # Queries with no regex metacharacters skip the regex engine entirely
+            needle = query.lower() if not use_regex or re.escape(query) == query else None
         except re.error as e:
             st.error(f"Invalid regex: {e}")
             return
 
-        with st.spinner("Searching..."):
-            for file_path in indexed_files:
-                if file_types:
-                    ext = Path(file_path).suffix.lower()
-                    if ext not in file_types:
-                        continue
-                
-                try:
-                    with open(file_path, "r", errors="ignore") as f:
-                        lines = f.readlines()
-                    
-                    for i, line in enumerate(lines, 1):
-                        if use_regex:
-                            if pattern.search(line):
-                                results.append({
-                                    "file": file_path,
-                                    "line_num": i,
-                                    "content": line.strip(),
-                                    "match": pattern.search(line).group()
-                                })
-                        else:
-                            if query.lower() in line.lower():
-                                results.append({
-                                    "file": file_path,
-                                    "line_num": i,
-                                    "content": line.strip(),
-                                    "match": query
-                                })
-                except Exception:
-                    continue
-        
-        st.markdown(f"**Found {len(results)} matches**")
-        
-        if results:
-            # Group by file
-            by_file = {}
-            for r in results:
-                f = r["file"]
-                if f not in by_file:
-                    by_file[f] = []
-                by_file[f].append(r)
-            
-            for file_path, matches in by_file.items():
-                filename = os.path.basename(file_path)
-                with st.expander(f"📄 {filename} ({len(matches)})", expanded=False):
-                    for m in matches[:5]:
-                        # Make clickable logic? Streamlit doesn't easily support clickable text to trigger state change without rerun
-                        # We use buttons
-                        if st.button(f"L{m['line_num']}: {m['content'][:40]}...", key=f"nav_{file_path}_{m['line_num']}"):
-                            st.session_state.selected_file = file_path
-                            # st.rerun() # Might not be needed if this triggers a rerun naturally
+        if file_types:
+            by_ext = _files_by_ext(indexed_files)
+            files = [f for ext in file_types for f in by_ext.get(ext, ())]
         else:
-            st.info("No matches.")
+            files = list(indexed_files)
+
+        # One stat per file, shared by the result cache key and the token index key
+        mtimes = {f: _mtime_ns(f) for f in indexed_files}
+
+        # Same inputs and no file changed since the last search: reuse its results
+        search_key = hash((query, use_regex, tuple(files), tuple(mtimes[f] for f in files)))
+        if st.session_state.get("search_key") == search_key:
+            st.session_state.search_page = 0
+            _render_search_results()
+            return
+
+        # Text every match must contain: the query itself, or a literal run inside the regex
+        literal = needle or _required_literal(pattern)
+
+        previous = st.session_state.get("search_job")
+        if previous is not None:
+            previous.cancel.set()
+        # Prefiltering and the scan run in the background; the script thread only polls
+        index_key = (tuple(indexed_files), tuple(mtimes.values()))
+        st.session_state.search_job = _SearchJob(files, pattern, needle, literal, search_key, index_key)
+        st.session_state.search_page = 0
+        st.session_state.pop("search_results", None)
+        st.session_state.pop("search_key", None)
+
+    if st.session_state.get("search_job") is not None:
+        _render_search_job()
+    else:
+        _render_search_results()
+
+
+def _rg_text(value: dict) -> str:
+    """rg --json gives UTF-8 text as "text" and anything else base64-encoded as "bytes"."""
+    if "text" in value:
+        return value["text"]
+    return base64.b64decode(value["bytes"]).decode("utf-8", "ignore")
+
+
+def _rg_matches(files: list, query: str, fixed: bool):
+    """
+    Yield (file, line_num, line, match) for case-insensitive hits from one rg run.
+    Raises ValueError when rg fails outright, e.g. on regex syntax only Python supports.
+    Closing the generator early kills the process.
+    """
+    cmd = [RG_PATH, "--json", "--no-config", "-i", "-m", str(MAX_FILE_MATCHES)]
+    if fixed:
+        cmd.append("-F")
+    cmd += ["-e", query, "--", *files]
+    completed = False
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL) as proc:
+        try:
+            for raw in proc.stdout:
+                event = json.loads(raw)
+                if event["type"] == "summary":
+                    completed = True
+                if event["type"] != "match":
+                    continue
+                data = event["data"]
+                submatches = data["submatches"]
+                yield (
+                    _rg_text(data["path"]),
+                    data["line_number"],
+                    _rg_text(data["lines"]).rstrip("\r\n"),
+                    _rg_text(submatches[0]["match"]) if submatches else "",
+                )
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+    # A run that searched anything ends with a summary event, even if some files errored
+    if not completed and proc.returncode == 2:
+        raise ValueError("ripgrep could not run this search")
+
+
+class _SearchJob:
+    """Scans files on a worker pool from a background thread until done or cancelled."""
+
+    def __init__(
+        self, files: list, pattern: re.Pattern, needle: Optional[str], literal: Optional[str],
+        key: int, index_key: tuple,
+    ):
+        self.key = key
+        self.total_files = len(files)
+        self.status = "Indexing files..."
+        self.scanned = 0
+        self.matches = 0
+        self.truncated = False
+        self.by_file = {}
+        self.cancel = threading.Event()
+        self.done = threading.Event()
+        self._lock = threading.Lock()
+        threading.Thread(target=self._run, args=(files, pattern, needle, literal, index_key), daemon=True).start()
+
+    def _prefilter(self, files: list, literal: Optional[str], index_key: tuple) -> list:
+        """Narrow files down to those that may contain `literal` (index first, then trigrams)."""
+        if not literal:
+            return files
+        # Files with no token containing each word of the literal can't match
+        candidates = _search_index(*index_key).candidates(literal)
+        if candidates is not None:
+            files = [f for f in files if f in candidates]
+        if len(literal) >= 3 and literal.isascii() and not self.cancel.is_set():
+            # Only scan files whose trigram filter admits every trigram of the literal
+            query_hashes = _trigram_hashes(literal.encode())
+            files = [f for f in files if _may_contain(f, query_hashes)]
+        return files
+
+    def _run(self, files, pattern, needle, literal, index_key):
+        try:
+            files = self._prefilter(files, literal, index_key)
+            self.total_files = len(files)
+            self.status = "Searching..."
+            if self.cancel.is_set():
+                return
+            if RG_PATH is not None and self._run_rg(files, pattern, needle):
+                return
+            with ThreadPoolExecutor(max_workers=SEARCH_WORKERS) as pool:
+                futures = [pool.submit(_scan_file, fp, pattern, needle, literal) for fp in files]
+                for future in as_completed(futures):
+                    # Checked between files, so a cancel takes effect after the current file
+                    if self.cancel.is_set():
+                        for pending in futures:
+                            pending.cancel()
+                        break
+                    matches = future.result()
+                    with self._lock:
+                        self.scanned += 1
+                        if matches:
+                            self.by_file[matches[0]["file"]] = matches
+                            self.matches += len(matches)
+                    if self.matches >= MAX_TOTAL_RESULTS:
+                        # Enough to show; don't read the rest of the codebase
+                        self.truncated = True
+                        for pending in futures:
+                            pending.cancel()
+                        break
+        finally:
+            self.done.set()
+
+    def _run_rg(self, files, pattern, needle) -> bool:
+        """Scan with ripgrep; False if rg rejected the pattern, so the Python scan should run."""
+        query, fixed = (needle, True) if needle else (pattern.pattern, False)
+        for start in range(0, len(files), RG_BATCH_SIZE):
+            if self.cancel.is_set():
+                return True
+            batch = files[start:start + RG_BATCH_SIZE]
+            try:
+                for file_path, line_num, line, match in _rg_matches(batch, query, fixed):
+                    with self._lock:
+                        self.by_file.setdefault(file_path, []).append(
+                            {"file": file_path, "line_num": line_num, "content": line, "match": match}
+                        )
+                        self.matches += 1
+                    if self.cancel.is_set():
+                        return True
+                    if self.matches >= MAX_TOTAL_RESULTS:
+                        self.truncated = True
+                        return True
+            except (OSError, ValueError) as e:
+                if start == 0 and not self.by_file:
+                    return False
+                logger.warning(f"ripgrep batch failed: {e}")
+            with self._lock:
+                self.scanned += len(batch)
+        return True
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.by_file), self.scanned
+
+
+def _render_search_job():
+    """Show a running search's progress and first page; hand results over once it finishes."""
+    job = st.session_state.get("search_job")
+    if job is None:
+        return
+
+    if _fragment is None:
+        # No fragment support: wait here, updating the count as files finish
+        progress = st.empty()
+        while not job.done.wait(0.25):
+            progress.markdown(f"**{job.status}** ({job.snapshot()[1]}/{job.total_files} files)")
+        progress.empty()
+
+    by_file, scanned = job.snapshot()
+    if job.done.is_set():
+        # Keep results so navigation clicks and paging don't need a new scan
+        st.session_state.search_results = by_file
+        st.session_state.search_truncated = job.truncated
+        if not job.cancel.is_set():
+            st.session_state.search_key = job.key
+        del st.session_state.search_job
+        st.rerun()
+
+    total = sum(len(matches) for matches in by_file.values())
+    st.markdown(f"**{job.status}** {total} matches so far ({scanned}/{job.total_files} files)")
+    st.button("Cancel search", key="search_cancel", on_click=job.cancel.set)
+    page = list(by_file.items())[:SEARCH_PAGE_SIZE]
+    if page:
+        st.markdown("".join(_file_matches_html(fp, matches) for fp, matches in page), unsafe_allow_html=True)
+
+
+# st.fragment (st.experimental_fragment before 1.37) reruns just this function every second
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+if _fragment is not None:
+    _render_search_job = _fragment(run_every=1)(_render_search_job)
+
+
+def _render_search_results():
+    """Render the current page of the last search's results from session state."""
+    by_file = st.session_state.get("search_results")
+    if by_file is None:
+        return
+
+    total = sum(len(matches) for matches in by_file.values())
+    st.markdown(f"**Found {total} matches**")
+    if st.session_state.get("search_truncated"):
+        st.caption(f"Search stopped after the first {MAX_TOTAL_RESULTS} matches; refine the pattern to see others.")
+    if not by_file:
+        st.info("No matches.")
+        return
+
+    start = st.session_state.get("search_page", 0) * SEARCH_PAGE_SIZE
+    page = list(by_file.items())[start:start + SEARCH_PAGE_SIZE]
+    # One markdown element for the whole page instead of an expander + buttons per file
+    st.markdown("".join(_file_matches_html(fp, matches) for fp, matches in page), unsafe_allow_html=True)
+    _render_open_file([fp for fp, _ in page])
+    _render_search_pager(len(by_file))
+
+
+def _change_search_page(delta: int):
+    st.session_state.search_page = st.session_state.get("search_page", 0) + delta
+
+
+def _render_search_pager(num_files: int):
+    num_pages = -(-num_files // SEARCH_PAGE_SIZE)
+    if num_pages <= 1:
+        return
+    page = st.session_state.get("search_page", 0)
+    col_prev, col_label, col_next = st.columns([1, 2, 1])
+    with col_prev:
+        st.button("◀ Prev", key="search_prev", disabled=page == 0,
+                  on_click=_change_search_page, args=(-1,))
+    with col_label:
+        st.caption(f"Page {page + 1} of {num_pages}")
+    with col_next:
+        st.button("Next ▶", key="search_next", disabled=page >= num_pages - 1,
+                  on_click=_change_search_page, args=(1,))
+
+
+def _file_matches_html(file_path: str, matches: list) -> str:
+    """Collapsible <details> block listing the first 5 matching lines of a file."""
+    filename = html.escape(os.path.basename(file_path))
+    lines = "\n".join(f"L{m['line_num']}: {html.escape(m['content'].strip())}" for m in matches[:5])
+    count = f"{len(matches)}+" if len(matches) >= MAX_FILE_MATCHES else len(matches)
+    return f"<details><summary>📄 {filename} ({count})</summary><pre>{lines}</pre></details>"
+
+
+def _open_search_file():
+    file_path = st.session_state.get("search_open_file")
+    if file_path:
+        st.session_state.selected_file = file_path
+
+
+def _render_open_file(file_paths: list):
+    """Single selectbox to open one of the listed result files in the viewer."""
+    if not file_paths:
+        return
+    st.selectbox(
+        "Open file",
+        [None] + file_paths,
+        format_func=lambda fp: "Select a result..." if fp is None else os.path.basename(fp),
+        key="search_open_file",
+        on_change=_open_search_file,
+    )
+
+
+# Generate panel answers, per engine instance: {engine: OrderedDict(prompt digest -> (answer, time))}.
+# Weak keys, so a re-indexed engine starts empty and a dropped one takes its answers with it.
+GENERATE_CACHE_TTL = 300
+GENERATE_CACHE_SIZE = 100
+_GENERATE_CACHE = weakref.WeakKeyDictionary()
+_GENERATE_LOCK = threading.Lock()
+
+
+def _generate(chat_engine, prompt: str) -> str:
+    """
+    chat_engine.chat(prompt) for the Generate panel, unwrapped to the answer text.
+    A repeated prompt against the same engine within GENERATE_CACHE_TTL reuses the
+    answer; the turn is still added to the engine's history. Errors are not cached.
+    """
+    digest = hashlib.blake2b(prompt.encode("utf-8"), digest_size=16).hexdigest()
+    with _GENERATE_LOCK:
+        answers = _GENERATE_CACHE.setdefault(chat_engine, OrderedDict())
+        hit = answers.get(digest)
+        if hit is not None and time.time() - hit[1] >= GENERATE_CACHE_TTL:
+            del answers[digest]
+            hit = None
+        if hit is not None:
+            answers.move_to_end(digest)
+    if hit is not None:
+        chat_engine._remember(prompt, hit[0])
+        return hit[0]
+
+    resp = chat_engine.chat(prompt)
+    # Unwrap if tuple
+    if isinstance(resp, tuple):
+        resp = resp[0]
+    if not resp.startswith("Error"):
+        with _GENERATE_LOCK:
+            answers[digest] = (resp, time.time())
+            while len(answers) > GENERATE_CACHE_SIZE:
+                answers.popitem(last=False)
+    return resp
 
 
 def render_generate_panel(chat_engine, indexed_files):
@@ -214,11 +895,7 @@ def render_generate_panel(chat_engine, indexed_files):
             with st.spinner("Working..."):
                 prompt = f"Generate code: {description}\nContext: {context}"
                 try:
-                    resp = chat_engine.chat(prompt)
-                     # Unwrap if tuple
-                    if isinstance(resp, tuple):
-                        resp = resp[0]
-                    st.code(resp)
+                    st.code(_generate(chat_engine, prompt))
                 except Exception as e:
                     st.error(str(e))
 
@@ -234,7 +911,7 @@ def render_generate_panel(chat_engine, indexed_files):
         selected_file = st.selectbox(
             "File", 
             indexed_files, 
-            format_func=lambda x: os.path.basename(x),
+            format_func=os.path.basename,
             key="mod_file_select"
         )
         
@@ -244,10 +921,7 @@ def render_generate_panel(chat_engine, indexed_files):
             with st.spinner("Modifying..."):
                 prompt = f"Modify {selected_file}: {modification}"
                 try:
-                    resp = chat_engine.chat(prompt)
-                    if isinstance(resp, tuple):
-                        resp = resp[0]
-                    st.code(resp)
+                    st.code(_generate(chat_engine, prompt))
                 except Exception as e:
                     st.error(str(e))
 
@@ -260,9 +934,6 @@ def render_generate_panel(chat_engine, indexed_files):
             with st.spinner("Creating..."):
                 prompt = f"Create file {fname}: {desc}"
                 try:
-                    resp = chat_engine.chat(prompt)
-                    if isinstance(resp, tuple):
-                        resp = resp[0]
-                    st.code(resp)
+                    st.code(_generate(chat_engine, prompt))
                 except Exception as e:
                     st.error(str(e))
@@ -1,10 +1,183 @@
 import streamlit as st
+import functools
+import glob
 import os
 import shutil
+import threading
+import uuid
 from dotenv import load_dotenv
+from components.style import load_logo_bytes, logo_mtime
+
+try:
+    from code_chatbot.core.rate_limiter import get_rate_limiter
+except ImportError:
+    get_rate_limiter = None
+
+# Per-provider API key variable and requests-per-minute limit
+PROVIDER_CONFIG = {
+    "gemini": {"env_key": "GOOGLE_API_KEY", "rpm": 15},
+    "groq": {"env_key": "GROQ_API_KEY", "rpm": 30},
+}
+
+
+@functools.lru_cache(maxsize=1)
+def _env() -> dict:
+    """Environment snapshot taken after a single .env load; cleared on Reset."""
+    load_dotenv()
+    return dict(os.environ)
+
+
+def _set_env(name: str, value: str):
+    """Export value unless it is already set; each os.environ write is a putenv call."""
+    if os.environ.get(name) != value:
+        os.environ[name] = value
+
+
+def _discard_dir(path: str):
+    """Rename path out of the way and delete it on a background thread."""
+    trash = f"{path}.trash.{uuid.uuid4().hex}"
+    os.rename(path, trash)
+    threading.Thread(target=shutil.rmtree, args=(trash,), kwargs={"ignore_errors": True}, daemon=True).start()
+
+
+# Directories Reset discards; only their renamed copies are ever swept
+DISCARDED_DIRS = ("chroma_db", "data")
+
+# Finish deletions a previous process didn't get to
+for _trash in [t for name in DISCARDED_DIRS for t in glob.glob(f"{name}.trash.*")]:
+    threading.Thread(target=shutil.rmtree, args=(_trash,), kwargs={"ignore_errors": True}, daemon=True).start()
+
+
+@st.cache_data(ttl=2, show_spinner=False)
+def _cached_stats(provider: str) -> dict:
+    """Usage stats shared by reruns within a 2s window; the limiter is process-wide per provider."""
+    return get_rate_limiter(provider).get_usage_stats()
+
+
+def _render_usage_stats(provider: str):
+    """API usage metrics for the active provider."""
+    try:
+        stats = _cached_stats(provider)
+    except Exception:
+        return  # Stats are optional
+
+    st.divider()
+    st.subheader("📊 API Usage")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Requests/min", stats['requests_last_minute'])
+        st.metric("Cache Hits", stats['cache_size'])
+    with col2:
+        st.metric("Total Tokens", f"{stats['total_tokens']:,}")
+        rpm_limit = PROVIDER_CONFIG[provider]["rpm"]
+        usage_pct = (stats['requests_last_minute'] / rpm_limit) * 100
+        st.progress(min(usage_pct / 100, 1.0), text=f"{usage_pct:.0f}% of limit")
+
+
+# Refresh the metrics on their own every 5s instead of with every app rerun
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+if _fragment is not None:
+    _render_usage_stats = _fragment(run_every=5)(_render_usage_stats)
+
+
+def _sidebar_config():
+    """Configuration widgets; publishes the settings to st.session_state.sidebar_config."""
+    # Provider Selection (Gemini & Groq only as requested)
+    provider = st.radio("LLM Provider", list(PROVIDER_CONFIG))
+    
+    # Model Selection for Gemini
+    gemini_model = None
+    if provider == "gemini":
+        gemini_model = st.selectbox(
+            "Gemini Model",
+            [
+                "gemini-2.5-flash",  # This one was working!
+                "gemini-2.0-flash",
+                "gemini-1.5-pro",
+            ],
+            index=0,  # Default to 2.5 Flash (confirmed working)
+            help="""**Gemini 2.5 Flash** (Recommended): Latest, confirmed working
+**Gemini 2.0 Flash**: Newer model
+**Gemini 1.5 Pro**: More stable for complex tasks"""
+        )
+        st.caption(f"✨ Using {gemini_model}")
+    
+    # Agentic Mode Toggle
+    use_agent = st.checkbox("Enable Agentic Reasoning 🤖", value=True, help="Allows the AI to browse files and reason multiple steps.")
+    
+    # Vector Database Selection
+    vector_db_type = st.selectbox("Vector Database", ["faiss", "chroma", "qdrant"])
+
+    env_key_name = PROVIDER_CONFIG[provider]["env_key"]
+    env = _env()
+    env_key = env.get(env_key_name)
+    api_key = env_key
+
+    if env_key:
+        st.success(f"✅ {env_key_name} loaded from environment.")
+
+    # Credentials sit in one form so typing in them doesn't rerun the app per field
+    if not env_key or vector_db_type == "qdrant":
+        with st.form("sidebar_creds", clear_on_submit=False):
+            api_key_input = None
+            if not env_key:
+                api_key_input = st.text_input(f"{provider.capitalize()} API Key", type="password")
+
+            qdrant_url = qdrant_key = None
+            if vector_db_type == "qdrant":
+                st.caption("☁️ connect to a hosted Qdrant cluster")
+                qdrant_url = st.text_input("Qdrant URL", placeholder="https://xyz.qdrant.io:6333", value=env.get("QDRANT_URL", ""))
+                qdrant_key = st.text_input("Qdrant API Key", type="password", value=env.get("QDRANT_API_KEY", ""))
+
+            submitted = st.form_submit_button("Save")
+
+        if api_key_input:
+            api_key = api_key_input
+        if submitted:
+            if api_key_input:
+                _set_env(env_key_name, api_key_input)
+            if qdrant_url:
+                _set_env("QDRANT_URL", qdrant_url)
+            if qdrant_key:
+                _set_env("QDRANT_API_KEY", qdrant_key)
+
+    # For Groq, we need an embedding provider
+    # Use LOCAL embeddings by default - NO RATE LIMITS!
+    embedding_provider = "local"  # Use local HuggingFace embeddings
+    embedding_api_key = api_key
+    
+    if provider == "groq":
+        st.info(f"ℹ️ {provider.capitalize()} is used for Chat. Using LOCAL embeddings (no rate limits!).")
+        embedding_provider = "local"  # Use local embeddings for Groq too
+        
+        # Check Embedding Key for Gemini (not needed for local)
+        emb_env_key = env.get("GOOGLE_API_KEY")
+        if not emb_env_key and provider != "gemini":
+             embedding_api_key = emb_env_key  # Optional now
+        else:
+             embedding_api_key = emb_env_key
+
+    config = {
+        "provider": provider,
+        "gemini_model": gemini_model,
+        "use_agent": use_agent,
+        "api_key": api_key,
+        "vector_db_type": vector_db_type,
+        "embedding_provider": embedding_provider,
+        "embedding_api_key": embedding_api_key,
+    }
+
+    previous = st.session_state.get("sidebar_config")
+    st.session_state.sidebar_config = config
+    if previous is not None and previous != config:
+        # A setting actually changed, so the main area needs a full rerun to see it
+        st.rerun()
+
+
+# Widget changes here rerun only this function, and chat reruns skip rebuilding it
+if _fragment is not None:
+    _sidebar_config = _fragment()(_sidebar_config)
 
-# Load Env
-load_dotenv()
 
 def render_sidebar():
     """
@@ -19,121 +192,27 @@ def render_sidebar():
             - embedding_provider (str)
             - embedding_api_key (str)
     """
-    config = {}
-    
     with st.sidebar:
         # Logo
-        if os.path.exists("assets/logo.png"):
-            st.image("assets/logo.png", use_column_width=True)
+        mtime = logo_mtime()
+        if mtime is not None:
+            st.image(load_logo_bytes(mtime), use_container_width=True)
         
         st.title("🔧 Configuration")
-        
-        # Provider Selection (Gemini & Groq only as requested)
-        provider = st.radio("LLM Provider", ["gemini", "groq"])
-        config["provider"] = provider
-        
-        # Model Selection for Gemini
-        gemini_model = None
-        if provider == "gemini":
-            gemini_model = st.selectbox(
-                "Gemini Model",
-                [
-                    "gemini-2.5-flash",  # This one was working!
-                    "gemini-2.0-flash",
-                    "gemini-1.5-pro",
-                ],
-                index=0,  # Default to 2.5 Flash (confirmed working)
-                help="""**Gemini 2.5 Flash** (Recommended): Latest, confirmed working
-**Gemini 2.0 Flash**: Newer model
-**Gemini 1.5 Pro**: More stable for complex tasks"""
-            )
-            st.caption(f"✨ Using {gemini_model}")
-        config["gemini_model"] = gemini_model
-        
-        # Agentic Mode Toggle
-        use_agent = st.checkbox("Enable Agentic Reasoning 🤖", value=True, help="Allows the AI to browse files and reason multiple steps.")
-        config["use_agent"] = use_agent
-        
-        # Determine Env Key Name
-        if provider == "gemini":
-            env_key_name = "GOOGLE_API_KEY"
-        elif provider == "groq":
-            env_key_name = "GROQ_API_KEY"
-            
-        env_key = os.getenv(env_key_name)
-        api_key = env_key
-        
-        if env_key:
-            st.success(f"✅ {env_key_name} loaded from environment.")
-        else:
-            # API Key Input
-            api_key_label = f"{provider.capitalize()} API Key"
-            api_key_input = st.text_input(api_key_label, type="password")
-            if api_key_input:
-                api_key = api_key_input
-                os.environ[env_key_name] = api_key
-        config["api_key"] = api_key
-    
-        # Vector Database Selection
-        vector_db_type = st.selectbox("Vector Database", ["faiss", "chroma", "qdrant"])
-        config["vector_db_type"] = vector_db_type
-        
-        if vector_db_type == "qdrant":
-            st.caption("☁️ connect to a hosted Qdrant cluster")
-            qdrant_url = st.text_input("Qdrant URL", placeholder="https://xyz.qdrant.io:6333", value=os.getenv("QDRANT_URL", ""))
-            qdrant_key = st.text_input("Qdrant API Key", type="password", value=os.getenv("QDRANT_API_KEY", ""))
-            
-            if qdrant_url:
-                os.environ["QDRANT_URL"] = qdrant_url
-            if qdrant_key:
-                os.environ["QDRANT_API_KEY"] = qdrant_key
-    
-        # For Groq, we need an embedding provider
-        # Use LOCAL embeddings by default - NO RATE LIMITS!
-        embedding_provider = "local"  # Use local HuggingFace embeddings
-        embedding_api_key = api_key
-        
-        if provider == "groq":
-            st.info(f"ℹ️ {provider.capitalize()} is used for Chat. Using LOCAL embeddings (no rate limits!).")
-            embedding_provider = "local"  # Use local embeddings for Groq too
-            
-            # Check Embedding Key for Gemini (not needed for local)
-            emb_env_key = os.getenv("GOOGLE_API_KEY")
-            if not emb_env_key and provider != "gemini":
-                 embedding_api_key = emb_env_key  # Optional now
-            else:
-                 embedding_api_key = emb_env_key
-                 
-        config["embedding_provider"] = embedding_provider
-        config["embedding_api_key"] = embedding_api_key
-    
+        _sidebar_config()
+        config = st.session_state.sidebar_config
+        provider = config["provider"]
+
         st.divider()
         
         # Ingestion moved to main area
-    
+
         if st.session_state.processed_files:
             st.success(f"✅ Codebase Ready ({provider}) + AST 🧠")
             
             # Show usage statistics if available
-            if st.session_state.chat_engine:
-                try:
-                    from code_chatbot.core.rate_limiter import get_rate_limiter
-                    limiter = get_rate_limiter(provider)
-                    stats = limiter.get_usage_stats()
-                    
-                    st.divider()
-                    st.subheader("📊 API Usage")
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        st.metric("Requests/min", stats['requests_last_minute'])
-                        st.metric("Cache Hits", stats['cache_size'])
-                    with col2:
-                        st.metric("Total Tokens", f"{stats['total_tokens']:,}")
-                        rpm_limit = 15 if provider == "gemini" else 30
-                        usage_pct = (stats['requests_last_minute'] / rpm_limit) * 100
-                        st.progress(usage_pct / 100, text=f"{usage_pct:.0f}% of limit")
-                except Exception as e:
-                    pass  # Stats are optional
+            if st.session_state.chat_engine and get_rate_limiter is not None:
+                _render_usage_stats(provider)
             
             st.divider()
             if st.button("🗑️ Clear Chat History"):
@@ -141,15 +220,16 @@ def render_sidebar():
                 st.rerun()
             
             if st.button("Reset"):
-                # Clear disk data for a true reset
+                # Clear disk data for a true reset; the rename is instant, deletion runs in the background
                 try:
                     if os.path.exists("chroma_db"):
-                        shutil.rmtree("chroma_db")
+                        _discard_dir("chroma_db")
                     if os.path.exists("data"):
-                        shutil.rmtree("data")
+                        _discard_dir("data")
                 except Exception as e:
                     st.error(f"Error clearing data: {e}")
-                    
+
+                _env.cache_clear()
                 st.session_state.processed_files = False
                 st.session_state.messages = []
                 st.session_state.chat_engine = None
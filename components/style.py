@@ -1,18 +1,48 @@
 import streamlit as st
 import base64
+import functools
+import logging
 import os
+import re
+from typing import Optional
 
-def apply_custom_css():
-    """Apply shared CSS styles to the current page."""
-    logo_b64 = ""
-    if os.path.exists("assets/logo.png"):
-        try:
-            with open("assets/logo.png", "rb") as f:
-                logo_b64 = base64.b64encode(f.read()).decode()
-        except:
-            pass
-
-    st.markdown("""
+logger = logging.getLogger(__name__)
+
+LOGO_PATH = "assets/logo.png"
+
+
+def logo_mtime() -> Optional[float]:
+    """mtime of the logo file (None if there is none); the logo caches' key, read on every rerun."""
+    try:
+        return os.path.getmtime(LOGO_PATH)
+    except OSError:
+        return None
+
+
+@st.cache_data(show_spinner=False)
+def load_logo_bytes(mtime: float) -> bytes:
+    """Logo file contents; mtime is only part of the cache key, so replacing the logo invalidates it."""
+    try:
+        with open(LOGO_PATH, "rb") as f:
+            return f.read()
+    except OSError as e:
+        logger.warning(f"Could not read logo {LOGO_PATH}: {e}")
+        return b""
+
+
+@st.cache_data(show_spinner=False)
+def _load_logo_b64(mtime: float) -> str:
+    return base64.b64encode(load_logo_bytes(mtime)).decode()
+
+
+def _minify_css(css: str) -> str:
+    """Drop comments and collapse whitespace so less is sent over the websocket on each rerun."""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    return re.sub(r"\s*([{};])\s*", r"\1", css).strip()
+
+
+_CSS_BASE = _minify_css("""
     <style>
         /* -------------------------------------------------------------------------- */
         /*                               CORE ANIMATIONS                              */
@@ -46,25 +76,6 @@ def apply_custom_css():
             font-family: 'Outfit', sans-serif;
         }
 
-        /* BACKGROUND WATERMARK */
-        .stApp::before {
-            content: "";
-            position: absolute;
-            top: 50%;
-            left: 50%;
-            transform: translate(-50%, -50%);
-            width: 70vh; /* Slightly smaller to fit nicely */
-            height: 70vh;
-            background-image: url("data:image/png;base64,LOGO_BASE64_PLACEHOLDER");
-            background-position: center;
-            background-repeat: no-repeat;
-            background-size: contain;
-            opacity: 0.08; /* Subtle but visible color */
-            pointer-events: none;
-            z-index: 0;
-            border-radius: 50%; /* Force Circular Shape */
-        }
-        
         /* Sidebar Logo - Standard Shape */
         [data-testid="stSidebar"] img {
             border-radius: 12px; /* Slight rounded corners for better aesthetics, but not circular */
@@ -407,4 +418,47 @@ def apply_custom_css():
         }
         
     </style>
-    """.replace("LOGO_BASE64_PLACEHOLDER", logo_b64), unsafe_allow_html=True)
+    """)
+
+
+_CSS_WATERMARK_TEMPLATE = _minify_css("""
+        /* BACKGROUND WATERMARK */
+        .stApp::before {
+            content: "";
+            position: absolute;
+            top: 50%;
+            left: 50%;
+            transform: translate(-50%, -50%);
+            width: 70vh; /* Slightly smaller to fit nicely */
+            height: 70vh;
+            background-image: url("data:image/png;base64,LOGO_BASE64_PLACEHOLDER");
+            background-position: center;
+            background-repeat: no-repeat;
+            background-size: contain;
+            opacity: 0.08; /* Subtle but visible color */
+            pointer-events: none;
+            z-index: 0;
+            border-radius: 50%; /* Force Circular Shape */
+        }
+""")
+
+
+@functools.lru_cache(maxsize=1)
+def _get_css(logo_b64: str) -> str:
+    # Without a logo the watermark rule is left out rather than shipped with an empty data URI
+    if not logo_b64:
+        return _CSS_BASE
+    watermark = _CSS_WATERMARK_TEMPLATE.replace("LOGO_BASE64_PLACEHOLDER", logo_b64)
+    return _CSS_BASE.replace("</style>", watermark + "</style>")
+
+
+def apply_custom_css():
+    """Apply shared CSS styles to the current page."""
+    mtime = logo_mtime()
+    logo_b64 = _load_logo_b64(mtime) if mtime is not None else ""
+    css = _get_css(logo_b64)
+    if hasattr(st, "html"):
+        # st.html (1.33+) injects raw HTML without running the markdown parser over the stylesheet
+        st.html(css)
+    else:
+        st.markdown(css, unsafe_allow_html=True)
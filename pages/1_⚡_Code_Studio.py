@@ -3,6 +3,7 @@
 """
 import streamlit as st
 import os
+import threading
 from components.style import apply_custom_css
 from components.file_explorer import render_file_tree
 from components.code_viewer import render_code_viewer_simple
@@ -24,6 +25,17 @@ if "processed_files" not in st.session_state or not st.session_state.processed_f
         st.switch_page("app.py")
     st.stop()
 
+# Read the shared state once per rerun; () is a reusable empty default
+_ss = st.session_state
+indexed_files = _ss.get("indexed_files") or ()
+workspace_root = _ss.get("workspace_root") or ""
+chat_engine = _ss.get("chat_engine")
+
+# Warm the retrieval stack in the background once per session so the first question starts hot
+if not _ss.get("_warmed") and getattr(chat_engine, "warmup", None):
+    threading.Thread(target=chat_engine.warmup, daemon=True).start()
+    _ss._warmed = True
+
 # --- Sidebar: Navigation & Explorer ---
 with st.sidebar:
     # 1. View Settings
@@ -33,10 +45,7 @@ with st.sidebar:
     st.divider()
     
     # 2. File Explorer
-    render_file_tree(
-        st.session_state.get("indexed_files", []),
-        st.session_state.get("workspace_root", "")
-    )
+    render_file_tree(indexed_files, workspace_root)
     
     st.divider()
     
@@ -49,22 +58,35 @@ with st.sidebar:
         st.session_state.selected_file = None
         st.switch_page("app.py")
 
+# The file tree may have just changed the selection, so read it after the sidebar
+selected_file = _ss.get("selected_file")
+
 # --- Main Workspace ---
 
+def generate_panel():
+    chat_engine = st.session_state.get("chat_engine")
+    if chat_engine:
+        render_generate_panel(chat_engine, st.session_state.get("indexed_files", []))
+
+
+# The Refactor/Generate panel only affects itself, so its widgets rerun just this fragment
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+if _fragment is not None:
+    generate_panel = _fragment(generate_panel)
+
+
 if layout_mode == "Tabs (Full Width)":
     # TABBED LAYOUT (Default)
     # Renamed "Agent" to "Refactor" for clarity
     tab_chat, tab_code, tab_refactor, tab_search = st.tabs(["💬 Chat", "📝 Code Editor", "✨ Refactor", "🔍 Search"])
     
     with tab_chat:
-        chat_engine = st.session_state.get("chat_engine")
         if chat_engine:
             render_chat_panel(chat_engine)
         else:
             st.error("Chat engine unavailable.")
             
     with tab_code:
-        selected_file = st.session_state.get("selected_file")
         if selected_file:
             filename = os.path.basename(selected_file)
             st.caption(f"Editing: {filename}")
@@ -73,12 +95,10 @@ if layout_mode == "Tabs (Full Width)":
             st.info("👈 Select a file from the sidebar to view code.")
             
     with tab_refactor:
-        chat_engine = st.session_state.get("chat_engine")
-        if chat_engine:
-            render_generate_panel(chat_engine, st.session_state.get("indexed_files", []))
+        generate_panel()
             
     with tab_search:
-        render_search_panel(st.session_state.get("indexed_files", []))
+        render_search_panel(indexed_files)
 
 else:
     # SPLIT VIEW (Legacy)
@@ -92,20 +112,16 @@ else:
         tab_sub_chat, tab_sub_search, tab_sub_agent = st.tabs(["💬 Chat", "🔍 Search", "✨ Agent"])
         
         with tab_sub_chat:
-            chat_engine = st.session_state.get("chat_engine")
             if chat_engine:
                 render_chat_panel(chat_engine)
         
         with tab_sub_search:
-            render_search_panel(st.session_state.get("indexed_files", []))
+            render_search_panel(indexed_files)
             
         with tab_sub_agent:
-            chat_engine = st.session_state.get("chat_engine")
-            if chat_engine:
-                render_generate_panel(chat_engine, st.session_state.get("indexed_files", []))
+            generate_panel()
     
     with col_editor:
-        selected_file = st.session_state.get("selected_file")
         if selected_file:
             st.caption(f"Editing: {os.path.basename(selected_file)}")
             render_code_viewer_simple(selected_file)
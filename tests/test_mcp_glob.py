@@ -0,0 +1,99 @@
+"""
+Tests for the MCP server's file discovery (RefactorMCPServer._iter_files).
+
+The os.scandir walk should return the same files as Path.glob filtered by
+_should_ignore, apart from the documented differences in _iter_files.
+"""
+
+import tempfile
+from pathlib import Path
+
+from pytest import mark
+
+from code_chatbot.mcp.mcp_server import RefactorMCPServer
+
+FILES = [
+    "a.py",
+    ".hidden.py",
+    "notes.txt",
+    "pkg/b.py",
+    "pkg/c.pyc",
+    "pkg/sub/c.py",
+    "pkg/sub/d.txt",
+    "pkg/sub/deeper/e.py",
+    "pkg/__pycache__/b.cpython-311.pyc",
+    "pkg/node_modules/n.py",
+    "node_modules/m.js",
+    "node_modules/x/y.js",
+    ".git/config",
+    ".git/hooks/h.py",
+]
+
+PATTERNS = [
+    "**/*",
+    "**/*.py",
+    "*.py",
+    "*",
+    "pkg/*.py",
+    "pkg/**/*.py",
+    "pkg/*/*.py",
+    "pkg/s?b/*",
+    "pkg/[bc].py",
+    "pkg/[!b].py",
+    "**/*.js",
+    "**/sub/*",
+]
+
+
+def _make_tree(root: Path):
+    for name in FILES:
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("x = 1\n")
+
+
+def _relative(root: Path, paths) -> set:
+    return {p.relative_to(root).as_posix() for p in paths}
+
+
+@mark.parametrize("pattern", PATTERNS)
+def test_iter_files_matches_path_glob(pattern):
+    """Same files as Path.glob + _should_ignore, minus those under pruned directories."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        _make_tree(root)
+        server = RefactorMCPServer(tmpdir)
+
+        expected = _relative(
+            root, (p for p in root.glob(pattern) if p.is_file() and not server._should_ignore(p))
+        )
+        # Intended difference: ignored directories are pruned at every depth
+        pruned = {".git", "node_modules", "__pycache__"}
+        expected = {f for f in expected if not pruned & set(f.split("/")[:-1])}
+
+        assert _relative(root, server._iter_files(pattern)) == expected
+
+
+def test_iter_files_prunes_ignored_directories():
+    """Top-level .git and node_modules files slip past Path.match but are skipped by the walk."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        _make_tree(root)
+        server = RefactorMCPServer(tmpdir)
+
+        found = _relative(root, server._iter_files("**/*"))
+
+        assert ".git/config" not in found
+        assert "node_modules/m.js" not in found
+        assert "pkg/node_modules/n.py" not in found
+        assert {"a.py", ".hidden.py", "pkg/sub/deeper/e.py"} <= found
+
+
+@mark.parametrize("pattern", ["**", "pkg/**", "pkg/sub/**/"])
+def test_trailing_double_star_yields_no_files(pattern):
+    """Path.glob only yields directories for a trailing '**', so no files are returned."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        _make_tree(Path(tmpdir))
+        server = RefactorMCPServer(tmpdir)
+
+        assert list(server._iter_files(pattern)) == []
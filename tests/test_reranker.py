@@ -0,0 +1,47 @@
+"""
+Tests for the cross-encoder score cache (reranker.py).
+"""
+
+from code_chatbot.retrieval.reranker import ScoreCache, _digest
+
+
+def test_score_cache_evicts_least_recently_used():
+    """Past maxsize the least recently used score goes, and a get() counts as a use."""
+    cache = ScoreCache(maxsize=3)
+    query = _digest("query")
+    keys = [ScoreCache.key(query, f"doc {i}") for i in range(4)]
+
+    for i, key in enumerate(keys[:3]):
+        cache.put(key, float(i))
+    assert cache.get(keys[0]) == 0.0  # doc 0 is now the most recent
+    cache.put(keys[3], 3.0)
+
+    assert len(cache) == 3
+    assert cache.get(keys[1]) is None
+    assert [cache.get(k) for k in (keys[0], keys[2], keys[3])] == [0.0, 2.0, 3.0]
+
+
+def test_score_cache_put_refreshes_existing_key():
+    """Overwriting a key updates its score and its recency without growing the cache."""
+    cache = ScoreCache(maxsize=2)
+    query = _digest("query")
+    first, second, third = (ScoreCache.key(query, text) for text in ("a", "b", "c"))
+
+    cache.put(first, 0.1)
+    cache.put(second, 0.2)
+    cache.put(first, 0.9)
+    cache.put(third, 0.3)
+
+    assert len(cache) == 2
+    assert cache.get(first) == 0.9
+    assert cache.get(second) is None
+
+
+def test_score_cache_keys_depend_on_query_and_text():
+    """The same text under another query is a different entry."""
+    cache = ScoreCache()
+    cache.put(ScoreCache.key(_digest("q1"), "doc"), 0.5)
+
+    assert cache.get(ScoreCache.key(_digest("q1"), "doc")) == 0.5
+    assert cache.get(ScoreCache.key(_digest("q2"), "doc")) is None
+    assert cache.get(ScoreCache.key(_digest("q1"), "doc2")) is None
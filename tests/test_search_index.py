@@ -0,0 +1,87 @@
+"""
+Tests for the inverted token index used by the search panel (search_index.py).
+"""
+
+import os
+import random
+import tempfile
+
+from pytest import mark
+
+from code_chatbot.retrieval.search_index import InvertedIndex, decode_vbyte, encode_vbyte
+
+_WORDS = ["def", "class", "Search", "index", "token", "get_user", "UserID", "x1", "parse_json", "éte"]
+_PUNCT = [" ", " ", "\n", "(", ")", ".", ",", "_", ":", "=", "  "]
+
+
+def _random_text(rng: random.Random, n_words: int) -> str:
+    return "".join(rng.choice(_WORDS) + rng.choice(_PUNCT) for _ in range(n_words))
+
+
+@mark.parametrize(
+    "ids",
+    [
+        [],
+        [0],
+        [0, 1, 2, 3],
+        [127, 128, 129],
+        [5, 16383, 16384, 2 ** 21, 2 ** 28 + 3],
+        sorted(random.Random(0).sample(range(1_000_000), 500)),
+    ],
+)
+def test_vbyte_round_trip(ids):
+    """decode_vbyte(encode_vbyte(ids)) gives back the ascending ids."""
+    assert decode_vbyte(encode_vbyte(ids)) == ids
+
+
+def test_vbyte_small_gaps_take_one_byte():
+    """Gaps below 128 are stored in a single byte each."""
+    ids = list(range(0, 1270, 10))
+    assert len(encode_vbyte(ids)) == len(ids)
+
+
+def test_candidates_has_no_false_negatives():
+    """Every file containing the query (case-insensitive) is among the candidates."""
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        contents = {}
+        for i in range(30):
+            path = os.path.join(tmpdir, f"file{i}.py")
+            contents[path] = _random_text(rng, rng.randint(0, 40))
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(contents[path])
+        index = InvertedIndex(sorted(contents))
+
+        # Substrings cut at arbitrary offsets, so words may be partial or span punctuation
+        queries = []
+        for text in contents.values():
+            for _ in range(5):
+                if len(text) < 3:
+                    break
+                start = rng.randrange(len(text) - 2)
+                queries.append(text[start:start + rng.randint(3, 15)])
+        queries += ["get_user(", "userid", "SEARCH index", ".parse_json", "nothing_like_this"]
+
+        for query in queries:
+            candidates = index.candidates(query)
+            if candidates is None:
+                continue
+            expected = {p for p, text in contents.items() if query.lower() in text.lower()}
+            assert expected <= candidates, query
+
+
+def test_candidates_keeps_unreadable_files():
+    """A file that couldn't be read during the build can't be ruled out."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        missing = os.path.join(tmpdir, "missing.py")
+        index = InvertedIndex([missing])
+
+        assert index.candidates("anything") == {missing}
+
+
+def test_candidates_without_indexable_words():
+    """Queries with no ASCII word of MIN_QUERY_WORD characters aren't narrowed."""
+    index = InvertedIndex([])
+
+    assert index.candidates("a.b") is None
+    assert index.candidates("été") is None
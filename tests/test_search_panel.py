@@ -0,0 +1,71 @@
+"""
+Tests for the search panel's per-file trigram filter (components/panels.py).
+"""
+
+import os
+import random
+import tempfile
+
+from components import panels
+
+_WORDS = ["def", "Class", "search", "Trigram", "bitmap", "get_user", "0x1F", "->", "{}", "naïve"]
+
+
+def _write_files(tmpdir: str, rng: random.Random, count: int) -> dict:
+    contents = {}
+    for i in range(count):
+        path = os.path.join(tmpdir, f"file{i}.py")
+        contents[path] = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(0, 60)))
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(contents[path])
+    return contents
+
+
+def _build_index(paths: list):
+    files = tuple(paths)
+    panels._search_index(files, tuple(panels._mtime_ns(f) for f in files))
+
+
+def test_trigram_filter_has_no_false_negatives():
+    """_may_contain never rejects a file that contains the literal (case-insensitive)."""
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        contents = _write_files(tmpdir, rng, 40)
+        _build_index(sorted(contents))
+
+        queries = ["get_user", "TRIGRAM bit", "nothing here", "->", "def def"]
+        for text in contents.values():
+            if len(text) >= 3:
+                start = rng.randrange(len(text) - 2)
+                queries.append(text[start:start + rng.randint(3, 12)])
+
+        rejected = 0
+        for query in queries:
+            literal = query.lower()
+            if len(literal) < 3 or not literal.isascii():
+                continue
+            hashes = panels._trigram_hashes(literal.encode())
+            for path, text in contents.items():
+                if not panels._may_contain(path, hashes):
+                    assert literal not in text.lower(), (query, path)
+                    rejected += 1
+        # The filter does prune something, so the check above isn't vacuous
+        assert rejected > 0
+
+
+def test_trigram_filter_keeps_files_without_a_bitmap():
+    """A file changed since the index build has no cached bitmap and is kept, not re-read."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "changed.py")
+        with open(path, "w") as f:
+            f.write("alpha beta")
+        _build_index([path])
+        hashes = panels._trigram_hashes(b"gamma")
+        assert not panels._may_contain(path, hashes)
+
+        with open(path, "w") as f:
+            f.write("gamma delta")
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        assert panels._may_contain(path, hashes)
@@ -0,0 +1,82 @@
+"""
+Tests for the chat engine's summary-buffer conversation memory (rag.py).
+"""
+
+import threading
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from code_chatbot.retrieval.rag import SummaryBufferMemory, _count_tokens
+
+
+class FakeLLM:
+    """Returns a fixed summary; optionally blocks until released."""
+
+    def __init__(self, summary: str = "Earlier: the user asked about the parser.", release=None):
+        self.summary = summary
+        self.release = release
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        if self.release is not None:
+            self.release.wait(5)
+        return AIMessage(content=self.summary)
+
+
+def _wait_for_summary(memory: SummaryBufferMemory, timeout: float = 5.0):
+    deadline = time.time() + timeout
+    while memory._summarizing and time.time() < deadline:
+        time.sleep(0.01)
+    assert not memory._summarizing
+
+
+def _turn(i: int):
+    return f"Question {i} about the tokenizer " * 5, f"Answer {i} explaining the tokenizer " * 5
+
+
+def test_short_history_is_kept_verbatim():
+    """Under the token limit no summary is made and every message is kept."""
+    llm = FakeLLM()
+    memory = SummaryBufferMemory(llm, max_token_limit=10_000)
+    memory.add_turn("What does chunk() do?", "It splits files.")
+
+    assert llm.prompts == []
+    assert [type(m) for m in memory.load()] == [HumanMessage, AIMessage]
+
+
+def test_old_turns_are_folded_into_the_summary():
+    """Over the limit, the oldest turns are summarized and the rest fit the budget."""
+    llm = FakeLLM()
+    memory = SummaryBufferMemory(llm, max_token_limit=10_000)
+    for i in range(3):
+        memory.add_turn(*_turn(i))
+    # Lower the budget so only the last turn starts a summary, over all four turns
+    memory.max_token_limit = 120
+    memory.add_turn(*_turn(3))
+    _wait_for_summary(memory)
+
+    loaded = memory.load()
+    assert isinstance(loaded[0], SystemMessage)
+    assert loaded[0].content == llm.summary
+    # Whole turns are pruned, oldest first, and the last turn is always kept
+    assert len(memory.messages) % 2 == 0 and len(memory.messages) >= 2
+    assert memory.messages[-1].content == _turn(3)[1]
+    assert len(memory.messages) == 2 or _count_tokens(memory.messages) <= 120
+    assert "Question 0" in llm.prompts[0]
+
+
+def test_clear_discards_a_running_summary():
+    """A summary finishing after clear() doesn't bring old turns back."""
+    release = threading.Event()
+    llm = FakeLLM(release=release)
+    memory = SummaryBufferMemory(llm, max_token_limit=120)
+    for i in range(4):
+        memory.add_turn(*_turn(i))
+    memory.clear()
+    release.set()
+    _wait_for_summary(memory)
+
+    assert memory.summary == ""
+    assert memory.load() == []
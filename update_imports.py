@@ -1,3 +1,4 @@
+import multiprocessing
 import os
 import re
 
@@ -45,40 +46,71 @@ replacements = {
     # Internal Relative Imports Fix (harder, but let's try absolute first)
 }
 
-# Directories to scan
-scan_dirs = ["backend/app", "tests"] 
-if os.path.exists("app.py"):
-    scan_dirs.append("app.py")
+# One alternation over every old module, so each file takes a single regex pass.
+# Longest names first so a module never loses to a shorter prefix of itself.
+import_re = re.compile(
+    r"(?m)^(\s*(?:from|import)\s+)("
+    + "|".join(re.escape(old) for old in sorted(replacements, key=len, reverse=True))
+    + r")(?=[\s.]|$)"
+)
 
-for root_path in scan_dirs:
-    if os.path.isfile(root_path):
-        files = [root_path]
-        root = os.path.dirname(root_path)
-    else:
-        files = []
-        for r, d, f in os.walk(root_path):
-            for file in f:
-                if file.endswith(".py"):
-                    files.append(os.path.join(r, file))
+# Package prefixes of the old modules ("code_chatbot", "api.routes"); a file that
+# contains none of them has nothing to rewrite and is never decoded or regex-scanned
+prefix_literals = {old.rsplit(".", 1)[0].encode() for old in replacements}
 
-    for file_path in files:
-        with open(file_path, "r") as f:
-            content = f.read()
-        
-        original_content = content
+def iter_py(root):
+    """Python files under root; scandir's entries know their type, so no extra stat per file."""
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from iter_py(entry.path)
+            elif entry.name.endswith(".py") and entry.is_file():
+                yield entry.path
+
+
+def process_file(file_path):
+    """Rewrite the old imports in one file; True if it changed."""
+    with open(file_path, "rb") as f:
+        raw = f.read()
+    if not any(prefix in raw for prefix in prefix_literals):
+        return False
+    content = raw.decode("utf-8")
+    
+    original_content = content
+    
+    # Replace "from X ..." / "import X ..." for any mapped X
+    content = import_re.sub(lambda m: m.group(1) + replacements[m.group(2)], content)
         
-        for old, new in replacements.items():
-            # Replace "from X import Y"
-            content = re.sub(f"from {old}([ .])", f"from {new}\\1", content)
-            content = re.sub(f"from {old}$", f"from {new}", content) # End of line
-            
-            # Replace "import X"
-            content = re.sub(f"import {old}([ .])", f"import {new}\\1", content)
-            content = re.sub(f"import {old}$", f"import {new}", content)
-            
-        if content != original_content:
-            print(f"Updating imports in {file_path}")
-            with open(file_path, "w") as f:
-                f.write(content)
+    if content == original_content:
+        return False
+    # Write bytes back: the content was decoded from raw bytes, so text mode would
+    # re-translate its \r\n line endings and use the locale encoding
+    with open(file_path, "wb") as f:
+        f.write(content.encode("utf-8"))
+    return True
+
+
+def main():
+    # Directories to scan
+    scan_dirs = ["backend/app", "tests"] 
+    if os.path.exists("app.py"):
+        scan_dirs.append("app.py")
+
+    files = []
+    for root_path in scan_dirs:
+        if os.path.isfile(root_path):
+            files.append(root_path)
+        elif os.path.isdir(root_path):
+            files.extend(iter_py(root_path))
+
+    # Files are independent, so the regex work spreads across all cores
+    with multiprocessing.Pool() as pool:
+        for file_path, changed in zip(files, pool.imap(process_file, files, chunksize=32)):
+            if changed:
+                print(f"Updating imports in {file_path}")
+
+    print("Import update script completed.")
+
 
-print("Import update script completed.")
+if __name__ == "__main__":
+    main()